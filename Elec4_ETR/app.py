@@ -1,11 +1,39 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, abort, Response, make_response
+from db import MySQLPool
 from forms import RegisterForm, LoginForm, ProductForm
 import os
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
-from exports.sales_export import export_sales_pdf, export_sales_docx
-from datetime import datetime, timedelta
+import sys
+import mimetypes
+import tempfile
+import threading
+from functools import wraps
+import click
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from exports.sales_export import EXPORT_FORMATS, stream_sales_csv, start_export, export_status, forget_export
+from exports.inventory_export import stream_inventory_csv
+from exports import export_cache
+from cache import TTLCache
+from pagination import encode_cursor, decode_cursor, decode_time_cursor, fetch_newest_first
+from facets import get_facets, invalidate_facets
+from search import search_clause, like_prefix
+from order_placement import place_order, InsufficientStock
+from cart_store import CartService, make_store
+from product_cache import ProductCache, stock_levels
+from page_cache import PageCache
+from dashboard_stats import StatsSnapshot
+from stock_alerts import AlertDispatcher, track as track_stock, track_category
+from category_counts import CountReconciler, MissingCategory
+from uploads import store_upload, is_media_key, media_path, variant_key, import_file, backfill_variants
+from jobs import submit, executor as jobs_executor
+import sales_rollup
+import category_counts
+from sales_report import REPORT_TYPES, fetch_sales_report, iter_sales_report
+from inventory_log import CHANGE_TYPES, parse_filters, log_query, iter_log
+from stock_adjustments import read_csv, clean_rows, apply_adjustments
+from product_import import import_products, iter_rows, start_import, import_status, assign_sku
+from exports.product_export import CATALOG_FORMATS, STREAMERS as CATALOG_STREAMERS, iter_catalog
+from assets import Manifest, VENDOR, DIST_DIR, build as build_assets
+from compression import CompressionMiddleware, SKIP as SKIP_COMPRESSION
 
 app = Flask(__name__)
 
@@ -14,22 +42,236 @@ app.config['MYSQL_USER'] = 'root'
 app.config['MYSQL_PASSWORD'] = ''
 app.config['MYSQL_DB'] = 'flask_ecommerce'
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
+app.config['MYSQL_POOL_SIZE'] = 10
+app.config['MYSQL_POOL_RECYCLE'] = 3600
+app.config['CART_REDIS_URL'] = None  # e.g. redis://localhost:6379/0; None keeps carts in-process
+app.config['PRODUCT_IMPORT_IMAGE_DIR'] = 'imports/images'  # bulk imports read product images from here
+app.config['STOCK_ALERT_WEBHOOK_URL'] = None  # low-stock alerts are POSTed here; None only logs them
 app.config['SECRET_KEY'] = 'secret123'
 
-UPLOAD_FOLDER = 'static/uploads/payments'
+# New uploads go to the content-addressed media store (see uploads.py); these
+# folders only hold files uploaded before it, until `flask migrate-uploads`
+PAYMENT_UPLOAD_FOLDER = 'static/uploads/payments'
 
 UPLOAD_FOLDER = 'static/uploads/products'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-mysql = MySQL(app)
+app.config['PAYMENT_UPLOAD_FOLDER'] = PAYMENT_UPLOAD_FOLDER
+
+mysql = MySQLPool(app)
+
+# gzip/brotli and weak ETags (304 for unchanged pages) for every response
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+def no_compression(view):
+    # Sends the view's responses untouched, e.g. send_file downloads that are
+    # already compressed or should keep their file wrapper and Range support
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request.environ[SKIP_COMPRESSION] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+# Catalog totals only drive the "Page X of Y" label, so a short-lived count is fine
+product_count_cache = TTLCache(ttl=60)
+
+# Product rows without stock; stock is always read fresh
+product_cache = ProductCache(ttl=300)
+
+# Whole pages for anonymous visitors (home, catalog); stock shown there may lag
+# by up to the fresh window, checkout re-checks it anyway
+page_cache = PageCache(fresh=30, stale=300)
+
+# Query parameters a cached page may depend on
+PAGE_CACHE_PARAMS = ('search', 'category', 'condition', 'brand', 'stock_status', 'page', 'after', 'before')
+
+cart_service = CartService(make_store(app.config['CART_REDIS_URL']), mysql.standalone_cursor)
+
+# Per-user order tab counts; dropped whenever one of the user's orders changes
+order_counts_cache = TTLCache(ttl=120)
+dashboard_stats = StatsSnapshot(mysql.standalone_cursor)
+stock_alert_dispatcher = AlertDispatcher(mysql.standalone_cursor, app.config['STOCK_ALERT_WEBHOOK_URL'])
+
+def invalidate_catalog(*product_ids):
+    invalidate_facets()
+    product_count_cache.clear()
+    product_cache.invalidate(*product_ids)
+    page_cache.clear()
+    dashboard_stats.invalidate()
+
+def invalidate_imported():
+    # Imports touch products by SKU, not id, so every cached row goes
+    invalidate_catalog()
+    product_cache.clear()
+    stock_alert_dispatcher.notify()
+
+def invalidate_stock():
+    # Stock isn't in product_cache, but counts and rendered pages show it
+    product_count_cache.clear()
+    page_cache.clear()
+    dashboard_stats.invalidate()
+    stock_alert_dispatcher.notify()
+
+# Hourly safety net for categories.product_count
+category_reconciler = CountReconciler(mysql.standalone_cursor, on_fixed=invalidate_catalog)
+category_reconciler.start()
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+@app.template_global()
+def upload_url(folder, filename, fmt=None):
+    # Small variant of an uploaded image, or the original until it is ready
+    if not is_media_key(filename):
+        return url_for('static', filename=f'uploads/{folder}/{filename}')
+    if fmt and os.path.exists(media_path(variant_key(filename, fmt))):
+        return url_for('media', key=variant_key(filename, fmt))
+    return url_for('media', key=filename)
+
+@app.route('/media/<key>')
+@no_compression
+def media(key):
+    # Content never changes under a key, so browsers and proxies may keep it forever
+    if not is_media_key(key) or not os.path.isfile(media_path(key)):
+        abort(404)
+
+    response = send_file(
+        os.path.abspath(media_path(key)),
+        etag=key.rsplit('.', 1)[0],
+        max_age=31536000,
+        conditional=True
+    )
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Fingerprinted build of the CSS/JS/fonts and home images (see assets.py).
+# Until `flask build-assets` has run, templates fall back to the CDN and the
+# original images.
+asset_manifest = Manifest()
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('image/webp', '.webp')
+
+@app.template_global()
+def asset_url(name):
+    rel = asset_manifest.file(name)
+    if rel:
+        return url_for('assets', filename=rel)
+    return VENDOR.get(name) or url_for('static', filename=name)
+
+@app.template_global()
+def image_srcset(name, fmt):
+    # "url 480w, url 960w, ..." for one format, '' before a build
+    variants = asset_manifest.image(name) or {}
+    return ', '.join(f"{url_for('assets', filename=rel)} {width}w" for width, rel in variants.get(fmt, []))
+
+@app.template_global()
+def image_src(name, width=None, fmt='jpg'):
+    # Largest variant no wider than width (the smallest if none is), or the
+    # original image before a build
+    variants = (asset_manifest.image(name) or {}).get(fmt)
+    if not variants:
+        return url_for('static', filename=name)
+    fitting = [rel for w, rel in variants if width is None or w <= width]
+    return url_for('assets', filename=fitting[-1] if fitting else variants[0][1])
+
+@app.route('/assets/<path:filename>')
+@no_compression
+def assets(filename):
+    # Names carry a content hash, so each file is cached forever. The
+    # precompressed sibling is sent when the browser accepts it.
+    path = safe_join(DIST_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    accepted = {token.split(';')[0].strip() for token in request.headers.get('Accept-Encoding', '').split(',')}
+    encoding = None
+    for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if name in accepted and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    response = send_file(
+        os.path.abspath(path),
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        max_age=31536000,
+        conditional=True
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    # Vendors, trims and fingerprints the front-end assets into static/dist
+    out = build_assets()
+    print(f"{len(out.files)} files, {len(out.images)} images written to {DIST_DIR}, "
+          f"{out.pruned} files of earlier builds pruned")
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads():
+    # Moves rows that still point at static/uploads over to media keys
+    sources = (
+        ('products', 'image', [UPLOAD_FOLDER]),
+        ('orders', 'payment_proof', [PAYMENT_UPLOAD_FOLDER, UPLOAD_FOLDER]),
+    )
+    with mysql.cursor() as cur:
+        for table, column, folders in sources:
+            cur.execute(f"SELECT DISTINCT {column} AS name FROM {table} WHERE {column} IS NOT NULL AND {column} <> ''")
+            for row in cur.fetchall():
+                if is_media_key(row['name']):
+                    continue
+                paths = [os.path.join(f, row['name']) for f in folders if os.path.isfile(os.path.join(f, row['name']))]
+                if not paths:
+                    print(f"{table}.{column}: {row['name']} not found, skipped")
+                    continue
+                key = import_file(paths[0])
+                cur.execute(f"UPDATE {table} SET {column}=%s WHERE {column}=%s", (key, row['name']))
+                print(f"{table}.{column}: {row['name']} -> {key}")
+        mysql.connection.commit()
+    jobs_executor.shutdown(wait=True)
+
+@app.cli.command('reconcile-category-counts')
+def reconcile_category_counts():
+    print(f"Fixed {category_reconciler.run()} categories")
+
+@app.cli.command('rebuild-sales-rollup')
+def rebuild_sales_rollup():
+    with mysql.cursor() as cur:
+        sales_rollup.rebuild(cur)
+        mysql.connection.commit()
+    print("sales_daily rebuilt")
+
+@app.cli.command('image-variants')
+def image_variants():
+    print(f"Queued {backfill_variants()} images")
+    jobs_executor.shutdown(wait=True)
+
+@app.cli.command('import-products')
+@click.argument('path')
+@click.option('--images', default=None, help='Directory to read product images from')
+def import_products_command(path, images):
+    # flask import-products catalog.csv|catalog.jsonl [--images DIR]
+    fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    progress = {}
+
+    def report():
+        invalidate_imported()
+        print(f"\r{progress['rows']} rows, {progress['rows_per_sec']} rows/s", end='', file=sys.stderr)
+
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        import_products(mysql.standalone_cursor, iter_rows(f, fmt), images, progress, report)
+    jobs_executor.shutdown(wait=True)
+
+    print()
+    print(f"{progress['created']} created, {progress['updated']} updated, {progress['failed']} failed "
+          f"in {progress['elapsed']}s ({progress['rows_per_sec']} rows/s)")
+    for error in progress['errors']:
+        print(error)
            
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -41,13 +283,12 @@ def register():
             method='pbkdf2:sha256'
         )
 
-        cur = mysql.connection.cursor()
-        cur.execute(
-            "INSERT INTO users (fullname, email, password) VALUES (%s, %s, %s)",
-            (form.fullname.data, form.email.data, hashed_password)
-        )
-        mysql.connection.commit()
-        cur.close()
+        with mysql.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (fullname, email, password) VALUES (%s, %s, %s)",
+                (form.fullname.data, form.email.data, hashed_password)
+            )
+            mysql.connection.commit()
 
         flash("Registered successfully!", "success")
         return redirect(url_for('login'))
@@ -60,13 +301,12 @@ def login():
     form = LoginForm()
 
     if form.validate_on_submit():
-        cur = mysql.connection.cursor()
-        cur.execute(
-            "SELECT * FROM users WHERE email = %s",
-            (form.email.data,)
-        )
-        user = cur.fetchone()
-        cur.close()
+        with mysql.cursor() as cur:
+            cur.execute(
+                "SELECT * FROM users WHERE email = %s",
+                (form.email.data,)
+            )
+            user = cur.fetchone()
 
         if user and check_password_hash(user['password'], form.password.data):
             session['user_id'] = user['id']
@@ -78,15 +318,60 @@ def login():
 
     return render_template('auth/login.html', form=form)
 
+def page_cache_key():
+    args = sorted((k, request.args.get(k)) for k in PAGE_CACHE_PARAMS if request.args.get(k))
+    return request.path + '?' + '&'.join(f"{k}={v}" for k, v in args)
+
+def refresh_page(view, url, key, generation):
+    try:
+        with app.test_request_context(url):
+            body = view()
+            if isinstance(body, str):
+                page_cache.store(key, body, generation)
+    finally:
+        page_cache.release_refresh(key)
+
+def cached_page(view):
+    # Serves anonymous visitors from page_cache with ETag/304 support. Logged-in
+    # users and requests with pending flash messages always render.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('user_id') or session.get('admin_id') or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        key = page_cache_key()
+        entry, state = page_cache.lookup(key)
+        if entry is None:
+            # Read before rendering: an invalidation during the render drops it
+            generation = page_cache.generation
+            body = view(*args, **kwargs)
+            if not isinstance(body, str):
+                return body
+            entry = page_cache.store(key, body, generation)
+        elif state == 'stale':
+            generation = page_cache.claim_refresh(key)
+            if generation is not None:
+                submit(refresh_page, view, request.full_path, key, generation)
+
+        response = make_response(entry['body'])
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = f'public, max-age=0, stale-while-revalidate={page_cache.stale}'
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
+
 @app.route('/')
+@cached_page
 def home():
     return render_template('home.html')
 
 @app.route('/products')
+@cached_page
 def products():
     page = request.args.get('page', 1, type=int)
     limit = 20
-    offset = (page - 1) * limit
+    after = decode_cursor(request.args.get('after', ''), 2)
+    before = decode_cursor(request.args.get('before', ''), 2)
 
     search = request.args.get('search', '')
     category = request.args.get('category', '')
@@ -94,70 +379,113 @@ def products():
     brand = request.args.get('brand', '')
     stock_status = request.args.get('stock_status', '')
 
-    cur = mysql.connection.cursor()
-
-    base_query = """
-        FROM products
-        JOIN categories ON products.category_id = categories.id
-        WHERE 1=1
-    """
-    params = []
-
-    if search:
-        base_query += " AND products.name LIKE %s"
-        params.append(f"%{search}%")
-
-    if category:
-        base_query += " AND categories.id = %s"
-        params.append(category)
-
-    if condition:
-        base_query += " AND products.condition_type = %s"
-        params.append(condition)
-
-    if brand:
-        base_query += " AND products.brand = %s"
-        params.append(brand)
-
-    if stock_status == 'available':
-        base_query += " AND products.stock > 0"
-
-    if stock_status == 'soldout':
-        base_query += " AND products.stock = 0"
-
-    # Count total products
-    cur.execute("SELECT COUNT(*) AS total " + base_query, params)
-    total = cur.fetchone()['total']
-    total_pages = (total + limit - 1) // limit
-
-    # Fetch paginated products
-    query = """
-    SELECT products.*, categories.name AS category
-    """ + base_query + """
-        ORDER BY products.stock = 0, products.id DESC
-        LIMIT %s OFFSET %s
-    """
-
-    cur.execute(query, params + [limit, offset])
-    products = cur.fetchall()
-
-    # Get brands for filter
-    cur.execute("SELECT DISTINCT brand FROM products WHERE brand IS NOT NULL")
-    brands = cur.fetchall()
-
-    # Get categories
-    cur.execute("SELECT id, name FROM categories")
-    categories = cur.fetchall()
-
-    cur.close()
+    with mysql.cursor() as cur:
+        base_query = """
+            FROM products
+            JOIN categories ON products.category_id = categories.id
+            WHERE 1=1
+        """
+        params = []
+
+        if search:
+            search_sql, search_params, _, _ = search_clause(search)
+            base_query += search_sql
+            params.extend(search_params)
+
+        if category:
+            base_query += " AND categories.id = %s"
+            params.append(category)
+
+        if condition:
+            base_query += " AND products.condition_type = %s"
+            params.append(condition)
+
+        if brand:
+            base_query += " AND products.brand = %s"
+            params.append(brand)
+
+        if stock_status == 'available':
+            base_query += " AND products.stock > 0"
+
+        if stock_status == 'soldout':
+            base_query += " AND products.stock = 0"
+
+        # Count total products (cached per filter combination, so it is approximate)
+        count_key = (search, category, condition, brand, stock_status)
+        total = product_count_cache.get(count_key)
+        if total is None:
+            cur.execute("SELECT COUNT(*) AS total " + base_query, params)
+            total = cur.fetchone()['total']
+            product_count_cache.set(count_key, total)
+        total_pages = max((total + limit - 1) // limit, 1)
+
+        # Fetch one page by seeking past the cursor on (stock = 0, id), the sort key.
+        # One extra row is fetched to know whether another page exists. Only ids
+        # and stock come from this query; the rest comes from the product cache.
+        select = "SELECT products.id, products.stock " + base_query
+
+        if before:
+            query = select + """
+                AND ((products.stock = 0) < %s
+                     OR ((products.stock = 0) = %s AND products.id > %s))
+                ORDER BY products.stock = 0 DESC, products.id ASC
+                LIMIT %s
+            """
+            cur.execute(query, params + [before[0], before[0], before[1], limit + 1])
+            products = list(cur.fetchall())
+            has_prev = len(products) > limit
+            products = products[:limit][::-1]
+            has_next = True
+        elif after:
+            query = select + """
+                AND ((products.stock = 0) > %s
+                     OR ((products.stock = 0) = %s AND products.id < %s))
+                ORDER BY products.stock = 0, products.id DESC
+                LIMIT %s
+            """
+            cur.execute(query, params + [after[0], after[0], after[1], limit + 1])
+            products = list(cur.fetchall())
+            has_prev = True
+            has_next = len(products) > limit
+            products = products[:limit]
+        else:
+            # Plain ?page=N links still work, but the pager below only emits cursors
+            query = select + """
+                ORDER BY products.stock = 0, products.id DESC
+                LIMIT %s OFFSET %s
+            """
+            cur.execute(query, params + [limit + 1, (page - 1) * limit])
+            products = list(cur.fetchall())
+            has_prev = page > 1
+            has_next = len(products) > limit
+            products = products[:limit]
+
+        if not has_prev:
+            page = 1
+
+        details = product_cache.get_many(cur, [p['id'] for p in products])
+        products = [{**details[p['id']], 'stock': p['stock']} for p in products if p['id'] in details]
+
+        prev_cursor = next_cursor = None
+        if products:
+            first, last = products[0], products[-1]
+            if has_prev:
+                prev_cursor = encode_cursor(first['stock'] == 0, first['id'])
+            if has_next:
+                next_cursor = encode_cursor(last['stock'] == 0, last['id'])
+
+        # Brands and categories for the filters (cached, with product counts)
+        facets = get_facets(cur)
 
     return render_template(
         'products/products.html',
         products=products,
-        categories=categories,
-        brands=brands,
+        categories=facets['categories'],
+        brands=facets['brands'],
         page=page,
         total_pages=total_pages,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
         search=search,
         category=category,
         condition=condition,
@@ -171,29 +499,10 @@ def add_to_cart(id):
         return redirect(url_for('login'))
 
     user_id = session['user_id']
-    cur = mysql.connection.cursor()
-
-    # Check if product already in cart
-    cur.execute("""
-        SELECT quantity FROM cart_items
-        WHERE user_id=%s AND product_id=%s
-    """, (user_id, id))
-    item = cur.fetchone()
-
-    if item:
-        cur.execute("""
-            UPDATE cart_items
-            SET quantity = quantity + 1
-            WHERE user_id=%s AND product_id=%s
-        """, (user_id, id))
-    else:
-        cur.execute("""
-            INSERT INTO cart_items(user_id, product_id, quantity)
-            VALUES(%s,%s,1)
-        """, (user_id, id))
-
-    mysql.connection.commit()
-    cur.close()
+    with mysql.cursor() as cur:
+        # One upsert, or nothing at all if a write for this item is already queued
+        cart_service.add(cur, user_id, id)
+        mysql.connection.commit()
 
     flash("Added to cart!", "success")
     return redirect(url_for('products'))
@@ -201,56 +510,46 @@ def add_to_cart(id):
 @app.route('/cart')
 def cart():
     user_id = session['user_id']
-    cur = mysql.connection.cursor()
+    with mysql.cursor() as cur:
+        quantities = cart_service.quantities(cur, user_id)
+
+        # Names and prices from the product cache, stock fresh from MySQL
+        products = product_cache.get_many(cur, quantities)
+        stock = stock_levels(cur, list(products))
+
+        items = []
+        for product_id, p in products.items():
+            quantity = quantities[product_id]
+            items.append({
+                'id': product_id,
+                'name': p['name'],
+                'price': p['price'],
+                'stock': stock.get(product_id, 0),
+                'quantity': quantity,
+                'subtotal': p['price'] * quantity
+            })
+
+        total = sum(item['subtotal'] for item in items)
 
-    cur.execute("""
-        SELECT p.id, p.name, p.price, p.stock, c.quantity,
-            (p.price * c.quantity) AS subtotal
-        FROM cart_items c
-        JOIN products p ON c.product_id = p.id
-        WHERE c.user_id = %s
-    """, (user_id,))
-    items = cur.fetchall()
-
-    total = sum(item['subtotal'] for item in items)
-
-    cur.close()
     return render_template('cart/cart.html', items=items, total=total)
 
 @app.route('/update-cart', methods=['POST'])
 def update_cart():
     user_id = session['user_id']
-    product_id = request.form['product_id']
+    product_id = int(request.form['product_id'])
     quantity = int(request.form['quantity'])
 
-    cur = mysql.connection.cursor()
+    # Coalesced with other quick changes and written to MySQL in a batch
+    cart_service.set_quantity(user_id, product_id, quantity)
 
-    if quantity > 0:
-        cur.execute("""
-            UPDATE cart_items
-            SET quantity=%s
-            WHERE user_id=%s AND product_id=%s
-        """, (quantity, user_id, product_id))
-    else:
-        cur.execute("""
-            DELETE FROM cart_items
-            WHERE user_id=%s AND product_id=%s
-        """, (user_id, product_id))
-
-    mysql.connection.commit()
-    cur.close()
     return redirect(url_for('cart'))
 
 @app.route('/remove-from-cart/<int:id>')
 def remove_from_cart(id):
     user_id = session['user_id']
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        DELETE FROM cart_items
-        WHERE user_id=%s AND product_id=%s
-    """, (user_id, id))
-    mysql.connection.commit()
-    cur.close()
+    with mysql.cursor() as cur:
+        cart_service.remove(cur, user_id, id)
+
     return redirect(url_for('cart'))
 
 @app.route('/checkout', methods=['POST'])
@@ -270,55 +569,39 @@ def checkout():
         if not proof or proof.filename == '':
             flash("Please upload proof of payment.", "danger")
             return redirect(url_for('cart'))
-        proof_filename = secure_filename(proof.filename)
-        proof.save(os.path.join(app.config['UPLOAD_FOLDER'], proof_filename))
-
-    cur = mysql.connection.cursor()
-
-    # Create order
-    cur.execute("""
-        INSERT INTO orders(user_id, payment_method, payment_proof)
-        VALUES(%s,%s,%s)
-    """, (user_id, payment_method, proof_filename))
-    order_id = cur.lastrowid
-
-    # Get selected cart items
-    format_strings = ','.join(['%s'] * len(selected_ids))
-    cur.execute(f"""
-        SELECT c.product_id, c.quantity, p.price, p.stock, p.name
-        FROM cart_items c
-        JOIN products p ON c.product_id = p.id
-        WHERE c.user_id=%s AND c.product_id IN ({format_strings})
-    """, (user_id, *selected_ids))
-    cart_items = cur.fetchall()
-
-    # Insert order items and reduce stock
-    for item in cart_items:
-        # Get quantity from form
-        qty_field = f'quantity_{item["product_id"]}'
-        quantity = int(request.form.get(qty_field, item['quantity']))  # default to DB quantity
-
-        # Check stock
-        if quantity > item['stock']:
-            flash(f"Not enough stock for {item['name']}. Max available: {item['stock']}", "danger")
-            return redirect(url_for('cart'))
+        proof_filename = store_upload(proof)
 
-        # Reduce stock
-        new_stock = item['stock'] - quantity
-        cur.execute("UPDATE products SET stock=%s WHERE id=%s", (new_stock, item['product_id']))
+    quantities = {
+        int(pid): int(request.form.get(f'quantity_{pid}'))
+        for pid in selected_ids
+        if request.form.get(f'quantity_{pid}')
+    }
 
-        # Insert into order_items
-        cur.execute("""
-            INSERT INTO order_items(order_id, product_id, quantity, price)
-            VALUES(%s,%s,%s,%s)
-        """, (order_id, item['product_id'], quantity, item['price']))
+    # place_order reads cart_items, so queued cart changes must land first
+    with mysql.cursor() as cur:
+        cart_service.flush(cur, user_id)
 
-        # Remove from cart
-        cur.execute("""DELETE FROM cart_items WHERE user_id=%s AND product_id=%s""",
-                    (user_id, item['product_id']))
+    try:
+        order_id = place_order(
+            mysql.connection, user_id, payment_method, proof_filename,
+            [int(pid) for pid in selected_ids], quantities
+        )
+    except InsufficientStock as e:
+        for item in e.items:
+            flash(f"Not enough stock for {item['name']}. Max available: {item['stock']}", "danger")
+        if not e.items:
+            flash("Stock changed while placing your order. Please try again.", "warning")
+        return redirect(url_for('cart'))
+
+    if order_id is None:
+        flash("Selected items are no longer in your cart.", "warning")
+        return redirect(url_for('cart'))
 
-    mysql.connection.commit()
-    cur.close()
+    product_count_cache.clear()
+    order_counts_cache.delete(user_id)
+    dashboard_stats.invalidate()
+    stock_alert_dispatcher.notify()
+    cart_service.forget(user_id)
     flash("Order placed successfully!", "success")
     return redirect(url_for('orders'))
 
@@ -331,71 +614,63 @@ def orders():
     user_id = session['user_id']
     status = request.args.get('status', 'Processing')
     page = request.args.get('page', 1, type=int)
+    after = decode_time_cursor(request.args.get('after', ''))
+    before = decode_time_cursor(request.args.get('before', ''))
     limit = 10
-    offset = (page - 1) * limit
-
-    cur = mysql.connection.cursor()
-
-    # 🔢 Get order counts per status
-    cur.execute("""
-        SELECT status, COUNT(*) AS total
-        FROM orders
-        WHERE user_id = %s
-        GROUP BY status
-    """, (user_id,))
-    rows = cur.fetchall()
-
-    # initialize counts
-    counts = {
-        'Processing': 0,  # Pending + Approved
-        'Shipped': 0,
-        'Delivered': 0,
-        'Declined': 0
-    }
 
-    # fill counts
-    for r in rows:
-        if r['status'] in ['Pending', 'Approved']:
-            counts['Processing'] += r['total']
-        elif r['status'] in counts:
-            counts[r['status']] = r['total']
+    with mysql.cursor() as cur:
+        # 🔢 Order counts per status (cached until one of this user's orders changes)
+        counts = order_counts_cache.get(user_id)
+        if counts is None:
+            cur.execute("""
+                SELECT status, COUNT(*) AS total
+                FROM orders
+                WHERE user_id = %s
+                GROUP BY status
+            """, (user_id,))
+            rows = cur.fetchall()
+
+            # initialize counts
+            counts = {
+                'Processing': 0,  # Pending + Approved
+                'Shipped': 0,
+                'Delivered': 0,
+                'Declined': 0
+            }
+
+            # fill counts
+            for r in rows:
+                if r['status'] in ['Pending', 'Approved']:
+                    counts['Processing'] += r['total']
+                elif r['status'] in counts:
+                    counts[r['status']] = r['total']
+
+            order_counts_cache.set(user_id, counts)
+
+        # The selected tab's total is already in the counts
+        total = counts.get(status, 0)
+        total_pages = max((total + limit - 1) // limit, 1)
+
+        # Fetch one page, keyed on (user_id, status, created_at, id)
+        if status == "Processing":
+            query = """
+                SELECT *
+                FROM orders
+                WHERE user_id=%s AND status IN ('Pending', 'Approved')
+            """
+            params = [user_id]
+        else:
+            query = """
+                SELECT *
+                FROM orders
+                WHERE user_id=%s AND status=%s
+            """
+            params = [user_id, status]
 
-    # Fetch total for pagination
-    if status == "Processing":
-        cur.execute("""
-            SELECT COUNT(*) AS total
-            FROM orders
-            WHERE user_id=%s AND status IN ('Pending', 'Approved')
-        """, (user_id,))
-    else:
-        cur.execute("""
-            SELECT COUNT(*) AS total
-            FROM orders
-            WHERE user_id=%s AND status=%s
-        """, (user_id, status))
-    total = cur.fetchone()['total']
-    total_pages = (total + limit - 1) // limit
-
-    # Fetch paginated orders
-    if status == "Processing":
-        cur.execute("""
-            SELECT *
-            FROM orders
-            WHERE user_id=%s AND status IN ('Pending', 'Approved')
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
-        """, (user_id, limit, offset))
-    else:
-        cur.execute("""
-            SELECT *
-            FROM orders
-            WHERE user_id=%s AND status=%s
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
-        """, (user_id, status, limit, offset))
-    orders = cur.fetchall()
+        orders, prev_cursor, next_cursor = fetch_newest_first(cur, query, params, limit, after, before)
 
-    cur.close()
+    if not prev_cursor:
+        page = 1
 
     return render_template(
         'orders/orders.html',
@@ -403,6 +678,8 @@ def orders():
         status=status,
         page=page,
         total_pages=total_pages,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
         counts=counts
     )
 
@@ -411,28 +688,29 @@ def order_details(id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
 
-    cur = mysql.connection.cursor()
-
-    # Order info
-    cur.execute("""
-        SELECT * FROM orders
-        WHERE id=%s AND user_id=%s
-    """, (id, session['user_id']))
-    order = cur.fetchone()
-
-    # Order items
-    cur.execute("""
-        SELECT oi.quantity, oi.price, p.name
-        FROM order_items oi
-        JOIN products p ON oi.product_id = p.id
-        WHERE oi.order_id=%s
-    """, (id,))
-    items = cur.fetchall()
-
-    # ✅ SUM TOTAL
-    total = sum(item['quantity'] * item['price'] for item in items)
+    with mysql.cursor() as cur:
+        # Order info
+        cur.execute("""
+            SELECT * FROM orders
+            WHERE id=%s AND user_id=%s
+        """, (id, session['user_id']))
+        order = cur.fetchone()
 
-    cur.close()
+        # Order items (names from the product cache)
+        cur.execute("""
+            SELECT oi.product_id, oi.quantity, oi.price
+            FROM order_items oi
+            WHERE oi.order_id=%s
+        """, (id,))
+        items = cur.fetchall()
+        products = product_cache.get_many(cur, [item['product_id'] for item in items])
+        items = [
+            {**item, 'name': products[item['product_id']]['name']}
+            for item in items if item['product_id'] in products
+        ]
+
+        # ✅ SUM TOTAL
+        total = sum(item['quantity'] * item['price'] for item in items)
     print(total)
     
     return render_template(
@@ -454,13 +732,12 @@ def admin_login():
         email = request.form['email']
         password = request.form['password']
 
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT * FROM users
-            WHERE email=%s AND role='admin'
-        """, (email,))
-        admin = cur.fetchone()
-        cur.close()
+        with mysql.cursor() as cur:
+            cur.execute("""
+                SELECT * FROM users
+                WHERE email=%s AND role='admin'
+            """, (email,))
+            admin = cur.fetchone()
 
         if admin and check_password_hash(admin['password'], password):
             session['admin_id'] = admin['id']
@@ -479,13 +756,12 @@ def admin_register():
         email = request.form['email']
         password = generate_password_hash(request.form['password'])
 
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO users (fullname, email, password, role)
-            VALUES (%s, %s, %s, 'admin')
-        """, (fullname, email, password))
-        mysql.connection.commit()
-        cur.close()
+        with mysql.cursor() as cur:
+            cur.execute("""
+                INSERT INTO users (fullname, email, password, role)
+                VALUES (%s, %s, %s, 'admin')
+            """, (fullname, email, password))
+            mysql.connection.commit()
 
         flash('Admin registered successfully')
         return redirect(url_for('admin_login'))
@@ -498,111 +774,87 @@ def admin_dashboard():
         flash("Unauthorized access", "danger")
         return redirect(url_for('home'))
 
-    cur = mysql.connection.cursor()
-
     # ADD PRODUCT
     if request.method == 'POST':
-        image_filename = None
-
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and allowed_file(file.filename):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-
-        cur.execute("""
-            INSERT INTO products
-            (name, description, price, stock, condition_type, category_id, image)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            request.form['name'],
-            request.form['description'],
-            request.form['price'],
-            request.form['stock'],
-            request.form['condition'],
-            request.form['category_id'],
-            image_filename
-        ))
-        mysql.connection.commit()
-        flash("Product added successfully", "success")
-
-    # GET PRODUCTS
-    cur.execute("""
-        SELECT products.*, categories.name AS category
-        FROM products
-        JOIN categories ON products.category_id = categories.id
-    """)
-    products = cur.fetchall()
-
-    # GET CATEGORIES
-    cur.execute("SELECT * FROM categories")
-    categories = cur.fetchall()
-
-    cur.close()
-
+        with mysql.cursor() as cur:
+            image_filename = None
+
+            if 'image' in request.files:
+                file = request.files['image']
+                if file and allowed_file(file.filename):
+                    image_filename = store_upload(file)
+
+            cur.execute("""
+                INSERT INTO products
+                (name, description, price, stock, condition_type, category_id, image)
+                VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """, (
+                request.form['name'],
+                request.form['description'],
+                request.form['price'],
+                request.form['stock'],
+                request.form['condition'],
+                request.form['category_id'],
+                image_filename
+            ))
+            product_id = cur.lastrowid
+            assign_sku(cur, product_id)
+            track_stock(cur, [product_id])
+            category_counts.adjust(cur, request.form['category_id'], 1)
+            mysql.connection.commit()
+            invalidate_catalog()
+            stock_alert_dispatcher.notify()
+            flash("Product added successfully", "success")
+
+    # Served from the in-memory snapshot; see dashboard_stats.py
     return render_template(
         'admin/dashboard.html',
-        products=products,
-        categories=categories
+        stats=dashboard_stats.get()
     )
 
-# ADMIN PRODUCT MANAGEMENT
-@app.route('/admin/products', methods=['GET', 'POST'])
-def admin_products():
-    if 'admin_id' not in session:
-        flash("Unauthorized access", "danger")
-        return redirect(url_for('home'))
-
-    cur = mysql.connection.cursor()
-
-    # ADD PRODUCT
-    if request.method == 'POST':
-        image_filename = None
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-
-        cur.execute("""
-            INSERT INTO products
-            (name, description, price, stock, condition_type, category_id, image)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            request.form['name'],
-            request.form['description'],
-            request.form['price'],
-            request.form['stock'],
-            request.form['condition'],
-            request.form['category_id'],
-            image_filename
-        ))
-        mysql.connection.commit()
-        flash("Product added successfully", "success")
-
-    # FILTER AND SEARCH
-    category_filter = request.args.get('category')
-    search_query = request.args.get('search', '').strip()
-    condition_filter = request.args.get('condition', '')
-    brand_filter = request.args.get('brand', '')
-    stock_status = request.args.get('stock_status', '')
-
-    # Build query with filters
+ADMIN_PRODUCT_FILTERS = ('category', 'search', 'condition', 'brand', 'stock_status')
+ADMIN_PRODUCT_PAGE_SIZE = 50
+# Search results are OFFSET-paged by relevance, up to this many matches
+ADMIN_SEARCH_MAX_RESULTS = 2000
+
+def admin_product_page(cur, args):
+    # One page of the admin product table: only the columns it shows, newest
+    # first and keyset-paged on id. Searches are ranked by relevance instead;
+    # relevance isn't a stable key, so their cursor is the next offset.
+    category_filter = args.get('category')
+    search_query = args.get('search', '').strip()
+    condition_filter = args.get('condition', '')
+    brand_filter = args.get('brand', '')
+    stock_status = args.get('stock_status', '')
+    after = decode_cursor(args.get('after', ''), 1)
+    limit = ADMIN_PRODUCT_PAGE_SIZE
+
+    select = """
+        SELECT p.id, p.name, p.price, p.stock, p.condition_type, p.image,
+               c.name AS category, w.level AS stock_level
+    """
+    # stock_level is 'low', 'sold_out' or NULL, by the effective threshold
     base_query = """
-        SELECT p.*, c.name AS category
         FROM products p
         JOIN categories c ON p.category_id = c.id
+        LEFT JOIN stock_watch w ON w.product_id = p.id
         WHERE 1=1
     """
     params = []
+    order_by = " ORDER BY p.id DESC"
 
     if category_filter:
-        base_query += " AND c.id = %s"
+        base_query += " AND p.category_id = %s"
         params.append(category_filter)
 
     if search_query:
-        base_query += " AND p.name LIKE %s"
-        params.append(f"%{search_query}%")
+        # Full-text search, best matches first
+        search_sql, search_params, score_sql, score_params = search_clause(search_query, 'p', 'c')
+        select += f", {score_sql} AS relevance"
+        params = score_params + params
+        base_query += search_sql
+        params.extend(search_params)
+        order_by = " ORDER BY relevance DESC, p.id DESC"
 
     if condition_filter:
         base_query += " AND p.condition_type = %s"
@@ -617,90 +869,164 @@ def admin_products():
     elif stock_status == 'soldout':
         base_query += " AND p.stock = 0"
     elif stock_status == 'low':
-        base_query += " AND p.stock > 0 AND p.stock <= 5"
-
-    base_query += " ORDER BY c.name, p.name"
-
-    if params:
-        cur.execute(base_query, params)
-    else:
-        cur.execute(base_query)
+        # Indexed low-stock set, honouring per-product/category thresholds
+        base_query += " AND w.level = 'low'"
 
-    products = cur.fetchall()
-
-    cur.execute("SELECT * FROM categories")
-    categories = cur.fetchall()
+    if search_query:
+        offset = min(after[0], ADMIN_SEARCH_MAX_RESULTS) if after else 0
+        cur.execute(select + base_query + order_by + " LIMIT %s OFFSET %s", params + [limit + 1, offset])
+        products = list(cur.fetchall())
+        next_offset = offset + limit
+        has_next = len(products) > limit and next_offset < ADMIN_SEARCH_MAX_RESULTS
+        return products[:limit], encode_cursor(next_offset) if has_next else None
+
+    if after:
+        base_query += " AND p.id < %s"
+        params.append(after[0])
+
+    cur.execute(select + base_query + order_by + " LIMIT %s", params + [limit + 1])
+    products = list(cur.fetchall())
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_cursor(products[-1]['id'])
+    return products[:limit], next_cursor
 
-    # Get brands for filter
-    cur.execute("SELECT DISTINCT brand FROM products WHERE brand IS NOT NULL")
-    brands = cur.fetchall()
+# ADMIN PRODUCT MANAGEMENT
+@app.route('/admin/products', methods=['GET', 'POST'])
+def admin_products():
+    if 'admin_id' not in session:
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
 
-    cur.close()
+    with mysql.cursor() as cur:
+        # ADD PRODUCT
+        if request.method == 'POST':
+            image_filename = None
+            if 'image' in request.files:
+                file = request.files['image']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    image_filename = store_upload(file)
+
+            cur.execute("""
+                INSERT INTO products
+                (name, description, price, stock, condition_type, category_id, image)
+                VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """, (
+                request.form['name'],
+                request.form['description'],
+                request.form['price'],
+                request.form['stock'],
+                request.form['condition'],
+                request.form['category_id'],
+                image_filename
+            ))
+            product_id = cur.lastrowid
+            assign_sku(cur, product_id)
+            track_stock(cur, [product_id])
+            category_counts.adjust(cur, request.form['category_id'], 1)
+            mysql.connection.commit()
+            invalidate_catalog()
+            stock_alert_dispatcher.notify()
+            flash("Product added successfully", "success")
+
+        products, next_cursor = admin_product_page(cur, request.args)
+
+        # Brands and categories for the filters (cached, with product counts)
+        facets = get_facets(cur)
+
+    # Carried along by the pager and the incremental loader
+    filter_args = {k: request.args[k] for k in ADMIN_PRODUCT_FILTERS if request.args.get(k)}
 
     return render_template(
         'admin/products.html',
         products=products,
-        categories=categories,
-        brands=brands,
-        selected_category=category_filter,
-        search_query=search_query,
-        condition_filter=condition_filter,
-        brand_filter=brand_filter,
-        stock_status=stock_status
+        next_cursor=next_cursor,
+        filter_args=filter_args,
+        page_size=ADMIN_PRODUCT_PAGE_SIZE,
+        categories=facets['categories'],
+        brands=facets['brands'],
+        selected_category=request.args.get('category'),
+        search_query=request.args.get('search', '').strip(),
+        condition_filter=request.args.get('condition', ''),
+        brand_filter=request.args.get('brand', ''),
+        stock_status=request.args.get('stock_status', '')
     )
 
+@app.route('/admin/products/rows')
+def admin_product_rows():
+    # Next page of the admin product table, for incremental loading
+    if 'admin_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
 
-@app.route('/admin/products/edit/<int:id>', methods=['GET', 'POST'])
-def edit_product(id):
-
-    cur = mysql.connection.cursor()
-
-    # ✅ FETCH FIRST (required for both GET and POST)
-    cur.execute("SELECT * FROM products WHERE id=%s", (id,))
-    product = cur.fetchone()
+    with mysql.cursor() as cur:
+        products, next_cursor = admin_product_page(cur, request.args)
 
-    if not product:
-        flash("Product not found", "danger")
-        return redirect(url_for('admin_products'))
+    for p in products:
+        p['image_url'] = upload_url('products', p['image'], 'webp') if p['image'] else None
+    return jsonify({'products': products, 'next_cursor': next_cursor})
 
-    if request.method == 'POST':
-        image_filename = product['image']  # ✅ now exists
 
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-
-        cur.execute("""
-            UPDATE products SET
-                name=%s,
-                description=%s,
-                price=%s,
-                stock=%s,
-                condition_type=%s,
-                category_id=%s,
-                image=%s
-            WHERE id=%s
-        """, (
-            request.form['name'],
-            request.form['description'],
-            request.form['price'],
-            request.form['stock'],
-            request.form['condition'],
-            request.form['category_id'],
-            image_filename,
-            id
-        ))
-
-        mysql.connection.commit()
-        flash("Product updated successfully", "success")
-        return redirect(url_for('admin_products'))
+@app.route('/admin/products/edit/<int:id>', methods=['GET', 'POST'])
+def edit_product(id):
 
-    # GET request only
-    cur.execute("SELECT * FROM categories")
-    categories = cur.fetchall()
-    cur.close()
+    with mysql.cursor() as cur:
+        # ✅ FETCH FIRST (required for both GET and POST)
+        product = product_cache.get(cur, id)
+
+        if not product:
+            flash("Product not found", "danger")
+            return redirect(url_for('admin_products'))
+
+        if request.method == 'POST':
+            image_filename = product['image']  # ✅ now exists
+
+            # The live category, locked, so its product count moves with it
+            cur.execute("SELECT category_id FROM products WHERE id=%s FOR UPDATE", (id,))
+            old_category_id = cur.fetchone()['category_id']
+
+            if 'image' in request.files:
+                file = request.files['image']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    image_filename = store_upload(file)
+
+            cur.execute("""
+                UPDATE products SET
+                    name=%s,
+                    description=%s,
+                    price=%s,
+                    stock=%s,
+                    condition_type=%s,
+                    category_id=%s,
+                    image=%s,
+                    low_stock_threshold=%s
+                WHERE id=%s
+            """, (
+                request.form['name'],
+                request.form['description'],
+                request.form['price'],
+                request.form['stock'],
+                request.form['condition'],
+                request.form['category_id'],
+                image_filename,
+                request.form.get('low_stock_threshold') or None,
+                id
+            ))
+            track_stock(cur, [id])
+            category_counts.move(cur, old_category_id, int(request.form['category_id']))
+
+            mysql.connection.commit()
+            invalidate_catalog(id)
+            stock_alert_dispatcher.notify()
+            flash("Product updated successfully", "success")
+            return redirect(url_for('admin_products'))
+
+        # GET request only: the form shows the live stock
+        product = {**product, 'stock': stock_levels(cur, [id]).get(id, 0)}
+
+        cur.execute("SELECT * FROM categories")
+        categories = cur.fetchall()
 
     return render_template(
         'admin/edit_product.html',
@@ -715,137 +1041,310 @@ def delete_product(id):
         flash("Unauthorized access", "danger")
         return redirect(url_for('home'))
     
-    cur = mysql.connection.cursor()
-    
-    try:
-        cur.execute("DELETE FROM products WHERE id=%s", (id,))
-        mysql.connection.commit()
-        flash("Product deleted", "success")
-    except:
-        flash("Cannot delete this product because it is linked to other records.", "warning")
-    finally:
-        cur.close()
+    with mysql.cursor() as cur:
+        try:
+            cur.execute("SELECT category_id FROM products WHERE id=%s FOR UPDATE", (id,))
+            product = cur.fetchone()
+            cur.execute("DELETE FROM products WHERE id=%s", (id,))
+            if product:
+                category_counts.adjust(cur, product['category_id'], -1)
+            mysql.connection.commit()
+            invalidate_catalog(id)
+            flash("Product deleted", "success")
+        except:
+            mysql.connection.rollback()
+            flash("Cannot delete this product because it is linked to other records.", "warning")
 
     return redirect(url_for('admin_products'))
 
+@app.route('/admin/products/import', methods=['GET', 'POST'])
+def import_products_page():
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            flash("Choose a CSV or JSONL file to import.", "warning")
+            return redirect(url_for('import_products_page'))
+
+        # The request is gone by the time the worker reads the file, so it is
+        # spooled to disk first; start_import deletes it when done.
+        fmt = 'jsonl' if file.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+        fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+        with os.fdopen(fd, 'wb') as f:
+            file.save(f)
+
+        job_id = start_import(
+            mysql.standalone_cursor, path, fmt,
+            app.config['PRODUCT_IMPORT_IMAGE_DIR'], invalidate_imported
+        )
+        return redirect(url_for('import_products_status', job_id=job_id))
+
+    return render_template('admin/product_import.html', progress=None)
+
+@app.route('/admin/products/import/<job_id>')
+def import_products_status(job_id):
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    progress = import_status(job_id)
+    if progress is None:
+        abort(404)
+
+    if request.args.get('format') == 'json':
+        return jsonify(progress)
+    return render_template('admin/product_import.html', progress=progress)
+
+@app.route('/admin/products/export')
+def export_products():
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in CATALOG_FORMATS:
+        fmt = 'csv'
+
+    def rows():
+        # Streams outside the request context on its own pooled connection
+        with mysql.standalone_cursor(server_side=True) as cur:
+            yield from iter_catalog(cur)
+
+    download_name, mimetype = CATALOG_FORMATS[fmt]
+    return Response(
+        CATALOG_STREAMERS[fmt](rows()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={download_name}'}
+    )
+
 # ADMIN INVENTORY MANAGEMENT
 @app.route('/admin/inventory', methods=['GET', 'POST'])
 def inventory():
-    cur = mysql.connection.cursor()
-
     # Handle stock update
     if request.method == 'POST':
-        product_id = int(request.form['product_id'])
-        qty = int(request.form['quantity'])
-        change_type = request.form['change_type']
-        remarks = request.form.get('remarks', '')
-
-        # Get current stock
-        cur.execute("SELECT stock FROM products WHERE id=%s", (product_id,))
-        current_stock = cur.fetchone()['stock']
-
-        if change_type == 'ADD':
-            new_stock = current_stock + qty
-        elif change_type == 'REMOVE':
-            new_stock = max(0, current_stock - qty)
-        else:  # ADJUST
-            new_stock = qty
-
-        # Update stock
-        cur.execute(
-            "UPDATE products SET stock=%s WHERE id=%s",
-            (new_stock, product_id)
+        lines, results = clean_rows([request.form])
+        if not lines:
+            flash(results[0]['message'], "warning")
+            return redirect(url_for('inventory'))
+
+        changed = apply_adjustments(mysql.connection, lines)
+        if not changed:
+            flash("Pick a product from the search results", "warning")
+            return redirect(url_for('inventory'))
+
+        invalidate_stock()
+        flash("Stock updated", "success")
+        return redirect(url_for('inventory'))
+
+    filters = parse_filters(request.args)
+    after = decode_time_cursor(request.args.get('after', ''))
+    before = decode_time_cursor(request.args.get('before', ''))
+    query, params = log_query(filters)
+
+    # Newest first, paged on (created_at, id)
+    with mysql.cursor() as cur:
+        logs, prev_cursor, next_cursor = fetch_newest_first(
+            cur, query, params, 50, after, before,
+            time_col='l.created_at', id_col='l.id'
         )
 
-        # Insert log
-        cur.execute("""
-            INSERT INTO inventory_logs
-            (product_id, change_type, quantity, previous_stock, new_stock, remarks)
-            VALUES (%s,%s,%s,%s,%s,%s)
-        """, (product_id, change_type, qty, current_stock, new_stock, remarks))
-
-        mysql.connection.commit()
+        # The picker only needs the name of the product being filtered on
+        selected_product = None
+        if 'product_id' in filters:
+            selected_product = product_cache.get(cur, filters['product_id'])
 
-    # Fetch data for page
-    cur.execute("""
-        SELECT l.*, p.name
-        FROM inventory_logs l
-        JOIN products p ON p.id = l.product_id
-        ORDER BY l.created_at DESC
-    """)
-    logs = cur.fetchall()
-
-    cur.execute("SELECT id, name FROM products ORDER BY name")
-    products = cur.fetchall()
+    filter_args = {
+        'product_id': request.args.get('product_id', ''),
+        'change_type': request.args.get('change_type', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+    }
 
-    cur.close()
     return render_template(
         'admin/inventory.html',
         logs=logs,
-        products=products
+        selected_product=selected_product,
+        change_types=CHANGE_TYPES,
+        filter_args=filter_args,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor
+    )
+
+@app.route('/admin/inventory/bulk', methods=['POST'])
+def bulk_inventory():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # JSON: a list of {product_id, change_type, qty, remarks} objects.
+    # CSV: an uploaded "file" with the same columns in a header row.
+    if request.is_json:
+        raw_rows = request.get_json(silent=True)
+        if isinstance(raw_rows, dict):
+            raw_rows = raw_rows.get('items')
+        if not isinstance(raw_rows, list) or not all(isinstance(r, dict) for r in raw_rows):
+            return jsonify({'error': 'Expected a list of adjustments'}), 400
+    elif 'file' in request.files:
+        raw_rows = read_csv(request.files['file'].stream)
+    else:
+        return jsonify({'error': 'Send JSON or a CSV file'}), 400
+
+    lines, results = clean_rows(raw_rows)
+    changed = apply_adjustments(mysql.connection, lines) if lines else set()
+    if changed:
+        invalidate_stock()
+
+    applied = sum(1 for r in results if r.get('status') == 'ok')
+    return jsonify({
+        'applied': applied,
+        'rejected': len(results) - applied,
+        'results': results,
+    })
+
+@app.route('/admin/inventory/products')
+def inventory_product_search():
+    if session.get('role') != 'admin':
+        return redirect('/login')
+
+    # Product picker: name prefix matches, a handful at a time
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify([])
+
+    with mysql.cursor() as cur:
+        cur.execute("""
+            SELECT id, name, stock
+            FROM products
+            WHERE name LIKE %s
+            ORDER BY name
+            LIMIT 20
+        """, (like_prefix(q),))
+        products = cur.fetchall()
+
+    return jsonify(list(products))
+
+@app.route('/admin/inventory/export')
+def export_inventory():
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    filters = parse_filters(request.args)
+
+    def rows():
+        # Streams outside the request context on its own pooled connection
+        with mysql.standalone_cursor(server_side=True) as cur:
+            yield from iter_log(cur, filters)
+
+    return Response(
+        stream_inventory_csv(rows()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=inventory_log.csv'}
     )
 
 # ADMIN CATEGORY MANAGEMENT
 @app.route('/admin/categories', methods=['GET', 'POST'])
 def manage_categories():
-    cur = mysql.connection.cursor()
-
-    # ADD CATEGORY
-    if request.method == 'POST':
-        name = request.form['name']
-
-        cur.execute(
-            "INSERT INTO categories (name) VALUES (%s)",
-            (name,)
-        )
-        mysql.connection.commit()
+    with mysql.cursor() as cur:
+        # ADD CATEGORY
+        if request.method == 'POST':
+            name = request.form['name']
+
+            cur.execute(
+                "INSERT INTO categories (name) VALUES (%s)",
+                (name,)
+            )
+            mysql.connection.commit()
+            invalidate_catalog()
+
+        # FETCH CATEGORIES + PRODUCT COUNT (kept by category_counts)
+        cur.execute("""
+            SELECT id, name, low_stock_threshold, product_count AS total_products
+            FROM categories
+            ORDER BY name
+        """)
+        categories = cur.fetchall()
 
-    # FETCH CATEGORIES + PRODUCT COUNT
-    cur.execute("""
-        SELECT c.id, c.name, COUNT(p.id) AS total_products
-        FROM categories c
-        LEFT JOIN products p ON p.category_id = c.id
-        GROUP BY c.id
-        ORDER BY c.name
-    """)
-    categories = cur.fetchall()
-
-    cur.close()
     return render_template('admin/categories.html', categories=categories)
 
 @app.route('/admin/categories/edit/<int:id>', methods=['POST'])
 def edit_category(id):
     name = request.form['name']
-    cur = mysql.connection.cursor()
-    cur.execute(
-        "UPDATE categories SET name=%s WHERE id=%s",
-        (name, id)
-    )
-    mysql.connection.commit()
-    cur.close()
+    threshold = request.form.get('low_stock_threshold') or None
+    with mysql.cursor() as cur:
+        cur.execute(
+            "UPDATE categories SET name=%s, low_stock_threshold=%s WHERE id=%s",
+            (name, threshold, id)
+        )
+        track_category(cur, id)
+        mysql.connection.commit()
+        invalidate_catalog()
+        product_cache.clear()  # cached rows carry the category name
+        stock_alert_dispatcher.notify()
+
     return redirect('/admin/categories')
 
 @app.route('/admin/categories/delete/<int:id>')
 def delete_category(id):
-    cur = mysql.connection.cursor()
+    with mysql.cursor() as cur:
+        # Only deletes the category while it has no products
+        kept = category_counts.delete_empty(cur, [id])
+        mysql.connection.commit()
 
-    # CHECK IF CATEGORY HAS PRODUCTS
-    cur.execute(
-        "SELECT COUNT(*) AS total FROM products WHERE category_id=%s",
-        (id,)
-    )
-    count = cur.fetchone()['total']
+    if kept:
+        flash('Cannot delete category with existing products', 'danger')
+    else:
+        invalidate_catalog()
+    return redirect('/admin/categories')
 
-    if count == 0:
-        cur.execute(
-            "DELETE FROM categories WHERE id=%s",
-            (id,)
-        )
+@app.route('/admin/categories/bulk', methods=['POST'])
+def bulk_categories():
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    action = request.form.get('action')
+    category_ids = [int(c) for c in request.form.getlist('category_ids') if c.isdigit()]
+    target = request.form.get('target_id', '')
+    if not category_ids:
+        flash("Select at least one category.", "warning")
+        return redirect('/admin/categories')
+    if action in ('merge', 'move') and not target.isdigit():
+        flash("Choose the category to move products into.", "warning")
+        return redirect('/admin/categories')
+
+    with mysql.cursor() as cur:
+        try:
+            if action == 'merge':
+                moved = category_counts.merge(cur, category_ids, int(target))
+                message = f"Merged {len(set(category_ids) - {int(target)})} categories ({moved} products moved)"
+            elif action == 'move':
+                moved = category_counts.move_products(cur, category_ids, int(target))
+                message = f"Moved {moved} products"
+            elif action == 'delete':
+                kept = category_counts.delete_empty(cur, category_ids)
+                message = f"Deleted {len(category_ids) - len(kept)} categories"
+                if kept:
+                    message += f", kept {len(kept)} that still have products"
+            else:
+                flash("Unknown action.", "warning")
+                return redirect('/admin/categories')
+        except MissingCategory:
+            mysql.connection.rollback()
+            flash("The category to move products into no longer exists.", "danger")
+            return redirect('/admin/categories')
+
+        if action in ('merge', 'move'):
+            # Moved products now fall under the target's low-stock threshold
+            track_category(cur, int(target))
         mysql.connection.commit()
-    else:
-        flash('Cannot delete category with existing products', 'danger')
 
-    cur.close()
+    invalidate_catalog()
+    product_cache.clear()  # cached rows carry the category name
+    stock_alert_dispatcher.notify()
+    flash(message, "success")
     return redirect('/admin/categories')
 
 #ADMIN ORDER MANAGEMENT
@@ -857,49 +1356,62 @@ def admin_orders():
 
     search_query = request.args.get('search', '').strip()
     status_filter = request.args.get('status', '')
+    after = decode_time_cursor(request.args.get('after', ''))
+    before = decode_time_cursor(request.args.get('before', ''))
+    limit = 50
 
-    cur = mysql.connection.cursor()
-    
     base_query = """
         SELECT o.*, u.fullname AS customer_name
         FROM orders o
         JOIN users u ON o.user_id = u.id
-        WHERE o.status IN ('Pending','Approved','Shipped','Delivered','Declined')
+        WHERE 1=1
     """
-
     params = []
 
-    if search_query:
-        base_query += " AND (u.fullname LIKE %s OR o.id LIKE %s)"
-        params.append(f"%{search_query}%")
-        params.append(f"%{search_query}%")
+    if search_query.lstrip('#').isdigit():
+        # Order numbers are looked up exactly
+        base_query += " AND o.id = %s"
+        params.append(int(search_query.lstrip('#')))
+    elif search_query:
+        # Prefix match so idx_users_fullname can be used
+        base_query += " AND u.fullname LIKE %s"
+        params.append(like_prefix(search_query))
 
     if status_filter:
         base_query += " AND o.status = %s"
         params.append(status_filter)
 
-    base_query += " ORDER BY o.created_at DESC"
+    # Newest first, paged on (created_at, id)
+    with mysql.cursor() as cur:
+        orders, prev_cursor, next_cursor = fetch_newest_first(
+            cur, base_query, params, limit, after, before,
+            time_col='o.created_at', id_col='o.id'
+        )
 
-    if params:
-        cur.execute(base_query, params)
-    else:
-        cur.execute(base_query)
-    
-    orders = cur.fetchall()
-    cur.close()
+    return render_template('admin/orders.html', orders=orders, search_query=search_query, status_filter=status_filter, prev_cursor=prev_cursor, next_cursor=next_cursor)
 
-    return render_template('admin/orders.html', orders=orders, search_query=search_query, status_filter=status_filter)
+def invalidate_order_counts(cur, order_id):
+    cur.execute("SELECT user_id FROM orders WHERE id=%s", (order_id,))
+    order = cur.fetchone()
+    if order:
+        order_counts_cache.delete(order['user_id'])
 
 @app.route('/admin/order/approve/<int:id>')
 def approve_order(id):
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        UPDATE orders
-        SET status='Approved', decline_reason=NULL
-        WHERE id=%s AND status='Pending'
-    """, (id,))
-    mysql.connection.commit()
-    cur.close()
+    with mysql.cursor() as cur:
+        cur.execute("""
+            UPDATE orders
+            SET status='Approved', decline_reason=NULL
+            WHERE id=%s AND status='Pending'
+        """, (id,))
+        changed = cur.rowcount and sales_rollup.apply_status_change(cur, id, 'Pending', 'Approved')
+        mysql.connection.commit()
+
+        invalidate_order_counts(cur, id)
+
+    dashboard_stats.invalidate()
+    if changed:
+        schedule_sales_prerender()
 
     flash("Order approved", "success")
     return redirect(url_for('admin_orders'))
@@ -908,14 +1420,20 @@ def approve_order(id):
 def decline_order(id):
     reason = request.form['reason']
 
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        UPDATE orders
-        SET status='Declined', decline_reason=%s
-        WHERE id=%s AND status='Pending'
-    """, (reason, id))
-    mysql.connection.commit()
-    cur.close()
+    with mysql.cursor() as cur:
+        cur.execute("""
+            UPDATE orders
+            SET status='Declined', decline_reason=%s
+            WHERE id=%s AND status='Pending'
+        """, (reason, id))
+        changed = cur.rowcount and sales_rollup.apply_status_change(cur, id, 'Pending', 'Declined')
+        mysql.connection.commit()
+
+        invalidate_order_counts(cur, id)
+
+    dashboard_stats.invalidate()
+    if changed:
+        schedule_sales_prerender()
 
     flash("Order declined", "danger")
     return redirect(url_for('admin_orders'))
@@ -923,18 +1441,50 @@ def decline_order(id):
 @app.route('/admin/order/update/<int:id>', methods=['POST'])
 def update_order(id):
     status = request.form.get('status')  # get from dropdown
-    cur = mysql.connection.cursor()
-    cur.execute(
-        "UPDATE orders SET status=%s WHERE id=%s",
-        (status, id)
-    )
-    mysql.connection.commit()
-    cur.close()
+    with mysql.cursor() as cur:
+        # Lock the row so the rollup sees the status we are replacing
+        cur.execute("SELECT user_id, status FROM orders WHERE id=%s FOR UPDATE", (id,))
+        order = cur.fetchone()
+        cur.execute(
+            "UPDATE orders SET status=%s WHERE id=%s",
+            (status, id)
+        )
+        changed = order and sales_rollup.apply_status_change(cur, id, order['status'], status)
+        mysql.connection.commit()
+
+    if order:
+        order_counts_cache.delete(order['user_id'])
+
+    dashboard_stats.invalidate()
+    if changed:
+        schedule_sales_prerender()
     flash("Order updated!", "success")
     return redirect(url_for('admin_orders'))
 
 
-from datetime import datetime, timedelta
+def sales_export_rows(report_type):
+    def rows():
+        # Runs outside the request, so it takes its own pooled connection
+        with mysql.standalone_cursor(server_side=True) as cur:
+            yield from iter_sales_report(cur, report_type)
+    return rows
+
+_prerender_queued = threading.Lock()
+
+def schedule_sales_prerender():
+    # Several status changes in a row share one queued pre-render
+    if _prerender_queued.acquire(blocking=False):
+        submit(prerender_sales_exports)
+
+def prerender_sales_exports():
+    # Warms the export cache with the PDFs admins download most
+    _prerender_queued.release()
+    with mysql.standalone_cursor() as cur:
+        watermark = sales_rollup.watermark(cur)
+
+    for report_type in REPORT_TYPES:
+        if not export_cache.lookup(report_type, 'pdf', watermark):
+            start_export('pdf', sales_export_rows(report_type), export_cache.cache_path(report_type, 'pdf', watermark))
 
 @app.route('/admin/sales')
 def admin_sales():
@@ -944,72 +1494,13 @@ def admin_sales():
 
     report_type = request.args.get('type', 'daily')
 
-    cur = mysql.connection.cursor()
-
-    # SQL query based on report type
-    if report_type == 'daily':
-        query = """
-            SELECT DATE(o.created_at) AS period,
-                   COUNT(DISTINCT o.id) AS total_orders,
-                   COALESCE(SUM(oi.quantity * oi.price), 0) AS total_sales
-            FROM orders o
-            JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.status IN ('Approved', 'Shipped', 'Delivered')
-            GROUP BY DATE(o.created_at)
-            ORDER BY period DESC
-        """
-    elif report_type == 'weekly':
-        query = """
-            SELECT YEARWEEK(o.created_at, 1) AS period,
-                   COUNT(DISTINCT o.id) AS total_orders,
-                   COALESCE(SUM(oi.quantity * oi.price), 0) AS total_sales
-            FROM orders o
-            JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.status IN ('Approved', 'Shipped', 'Delivered')
-            GROUP BY YEARWEEK(o.created_at, 1)
-            ORDER BY period DESC
-        """
-    else:  # monthly
-        query = """
-            SELECT DATE_FORMAT(o.created_at, '%Y-%m') AS period,
-                   COUNT(DISTINCT o.id) AS total_orders,
-                   COALESCE(SUM(oi.quantity * oi.price), 0) AS total_sales
-            FROM orders o
-            JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.status IN ('Approved', 'Shipped', 'Delivered')
-            GROUP BY DATE_FORMAT(o.created_at, '%Y-%m')
-            ORDER BY period DESC
-        """
-
-    cur.execute(query)
-    reports = cur.fetchall()
-    cur.close()
-
-    # Format period for readability
-    formatted_reports = []
-    for r in reports:
-        period = r['period']
-        if report_type == 'daily':
-            period = datetime.strptime(str(period), "%Y-%m-%d").strftime("%b %d, %Y")  # Jan 07, 2026
-        elif report_type == 'weekly':
-            # period = YEARWEEK, e.g. 202601
-            year = int(str(period)[:4])
-            week = int(str(period)[4:])
-            monday = datetime.strptime(f'{year}-W{week}-1', "%Y-W%W-%w")
-            sunday = monday + timedelta(days=6)
-            period = f"{monday.strftime('%b %d')} – {sunday.strftime('%b %d, %Y')}"
-        else:  # monthly
-            period = datetime.strptime(str(period), "%Y-%m").strftime("%B %Y")  # January 2026
-
-        formatted_reports.append({
-            'period': period,
-            'total_orders': r['total_orders'],
-            'total_sales': r['total_sales']
-        })
+    # Totals come from the sales_daily rollup, not the order history
+    with mysql.cursor() as cur:
+        reports = fetch_sales_report(cur, report_type)
 
     return render_template(
         'admin/sales.html',
-        reports=formatted_reports,
+        reports=reports,
         report_type=report_type
     )
 
@@ -1021,57 +1512,68 @@ def export_sales():
 
     report_type = request.args.get('type', 'daily')
     format = request.args.get('format', 'pdf')
+    if format not in EXPORT_FORMATS:
+        format = 'pdf'
+
+    if report_type not in REPORT_TYPES:
+        report_type = 'daily'
+
+    # CSV streams straight from the cursor; documents are rendered off-request
+    if format == 'csv':
+        download_name, mimetype = EXPORT_FORMATS['csv']
+        return Response(
+            stream_sales_csv(sales_export_rows(report_type)()),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
+        )
+
+    # Same report over the same data: send the file rendered last time
+    with mysql.cursor() as cur:
+        watermark = sales_rollup.watermark(cur)
+
+    cached = export_cache.lookup(report_type, format, watermark)
+    if cached:
+        download_name, mimetype = EXPORT_FORMATS[format]
+        return send_file(cached, as_attachment=True, download_name=download_name, mimetype=mimetype)
+
+    job_id = start_export(
+        format,
+        sales_export_rows(report_type),
+        export_cache.cache_path(report_type, format, watermark)
+    )
+    return redirect(url_for('export_sales_download', job_id=job_id))
+
+@app.route('/admin/sales/export/<job_id>')
+@no_compression
+def export_sales_download(job_id):
+    if session.get('role') != 'admin':
+        flash("Unauthorized access", "danger")
+        return redirect(url_for('home'))
+
+    status, job = export_status(job_id)
+    if status is None:
+        abort(404)
+
+    if status == 'pending':
+        return render_template('admin/export_pending.html', job_id=job_id)
+
+    if status == 'failed':
+        forget_export(job_id)
+        flash("The export could not be generated. Please try again.", "danger")
+        return redirect(url_for('admin_sales'))
+
+    # Opened first: once open, a cache eviction can no longer pull the file away
+    try:
+        report = open(job['path'], 'rb')
+    except FileNotFoundError:
+        return redirect(url_for('export_sales_download', job_id=job_id))
+
+    download_name, mimetype = EXPORT_FORMATS[job['format']]
+    response = send_file(report, as_attachment=True, download_name=download_name, mimetype=mimetype)
+    response.call_on_close(lambda: forget_export(job_id))
+    return response
+
 
-    if report_type == 'weekly':
-        group = "YEARWEEK(o.created_at, 1)"  # Week starts on Monday
-    elif report_type == 'monthly':
-        group = "DATE_FORMAT(o.created_at, '%Y-%m')"
-    else:
-        group = "DATE(o.created_at)"
-
-    cur = mysql.connection.cursor()
-    cur.execute(f"""
-        SELECT 
-            {group} AS period,
-            COUNT(DISTINCT o.id) AS total_orders,
-            SUM(oi.quantity * oi.price) AS total_sales
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        WHERE LOWER(o.status) IN ('approved','shipped','delivered')
-        GROUP BY {group}
-        ORDER BY {group} DESC
-    """)
-    rows = cur.fetchall()
-    cur.close()
-
-    # Format period like in the web table
-    formatted_data = []
-    for r in rows:
-        period = r['period']
-        total_sales = r['total_sales'] if r['total_sales'] is not None else 0  # Handle NULL
-        if report_type == 'daily':
-            period = datetime.strptime(str(period), "%Y-%m-%d").strftime("%b %d, %Y")  # Jan 07, 2026
-        elif report_type == 'weekly':
-            # period = YEARWEEK, e.g. 202601
-            year = int(str(period)[:4])
-            week = int(str(period)[4:])
-            monday = datetime.strptime(f'{year}-W{week}-1', "%Y-W%W-%w")
-            sunday = monday + timedelta(days=6)
-            period = f"{monday.strftime('%b %d')} – {sunday.strftime('%b %d, %Y')}"
-        else:  # monthly
-            period = datetime.strptime(str(period), "%Y-%m").strftime("%B %Y")  # January 2026
-
-        formatted_data.append({
-            'period': period,
-            'total_orders': r['total_orders'],
-            'total_sales': total_sales
-        })
-
-    if format == 'pdf':
-        return export_sales_pdf(formatted_data)
-    else:
-        return export_sales_docx(formatted_data)
-    
 @app.route('/admin/users')
 def admin_users():
     # make sure only admins can access
@@ -1082,35 +1584,33 @@ def admin_users():
     role_filter = request.args.get('role', '')
     status_filter = request.args.get('status', '')
 
-    cur = mysql.connection.cursor()
-    
-    base_query = "SELECT id, fullname, email, role, is_active FROM users WHERE 1=1"
-    params = []
+    with mysql.cursor() as cur:
+        base_query = "SELECT id, fullname, email, role, is_active FROM users WHERE 1=1"
+        params = []
 
-    if search_query:
-        base_query += " AND (fullname LIKE %s OR email LIKE %s)"
-        params.append(f"%{search_query}%")
-        params.append(f"%{search_query}%")
+        if search_query:
+            base_query += " AND (fullname LIKE %s OR email LIKE %s)"
+            params.append(f"%{search_query}%")
+            params.append(f"%{search_query}%")
 
-    if role_filter:
-        base_query += " AND role = %s"
-        params.append(role_filter)
+        if role_filter:
+            base_query += " AND role = %s"
+            params.append(role_filter)
 
-    if status_filter:
-        if status_filter == 'active':
-            base_query += " AND is_active = 1"
-        elif status_filter == 'inactive':
-            base_query += " AND is_active = 0"
+        if status_filter:
+            if status_filter == 'active':
+                base_query += " AND is_active = 1"
+            elif status_filter == 'inactive':
+                base_query += " AND is_active = 0"
 
-    base_query += " ORDER BY id DESC"
+        base_query += " ORDER BY id DESC"
 
-    if params:
-        cur.execute(base_query, params)
-    else:
-        cur.execute(base_query)
+        if params:
+            cur.execute(base_query, params)
+        else:
+            cur.execute(base_query)
     
-    users = cur.fetchall()
-    cur.close()
+        users = cur.fetchall()
     
     return render_template('admin/users.html', users=users, search_query=search_query, role_filter=role_filter, status_filter=status_filter)
 
@@ -1122,12 +1622,12 @@ def reset_user_password(user_id):
     new_password = request.form['password']
     hashed = generate_password_hash(new_password)
 
-    cur = mysql.connection.cursor()
-    cur.execute(
-        "UPDATE users SET password=%s WHERE id=%s",
-        (hashed, user_id)
-    )
-    cur.connection.commit()
+    with mysql.cursor() as cur:
+        cur.execute(
+            "UPDATE users SET password=%s WHERE id=%s",
+            (hashed, user_id)
+        )
+        mysql.connection.commit()
 
     flash("Password reset successfully", "success")
     return redirect(url_for('admin_users'))
@@ -1137,17 +1637,45 @@ def toggle_user(user_id):
     if session.get('role') != 'admin':
         return redirect('/login')
 
-    cur = mysql.connection.cursor()
-    cur.execute(
-        "UPDATE users SET is_active = NOT is_active WHERE id=%s",
-        (user_id,)
-    )
-    cur.connection.commit()
+    with mysql.cursor() as cur:
+        cur.execute(
+            "UPDATE users SET is_active = NOT is_active WHERE id=%s",
+            (user_id,)
+        )
+        mysql.connection.commit()
+
+    dashboard_stats.invalidate()
 
     flash("User status updated", "success")
     return redirect(url_for('admin_users'))
 
 
+@app.route('/admin/stock-alerts')
+def stock_alerts_feed():
+    if session.get('role') != 'admin':
+        return redirect('/login')
+
+    with mysql.cursor() as cur:
+        cur.execute("""
+            SELECT a.id, a.product_id, p.name, a.level, a.stock, a.threshold,
+                   a.created_at, a.delivered_at
+            FROM stock_alerts a
+            JOIN products p ON p.id = a.product_id
+            ORDER BY a.id DESC
+            LIMIT 50
+        """)
+        alerts = cur.fetchall()
+
+    return jsonify(list(alerts))
+
+@app.route('/admin/db-pool')
+def db_pool_stats():
+    if session.get('role') != 'admin':
+        return redirect('/login')
+
+    return jsonify(mysql.pool.stats())
+
+
 @app.route('/admin/logout')
 def admin_logout():
     session.clear()
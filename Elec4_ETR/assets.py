@@ -0,0 +1,303 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import time
+import urllib.parse
+import urllib.request
+
+from PIL import Image, ImageOps
+
+# Build-time asset pipeline (run with `flask build-assets`). Third-party CSS,
+# JS and fonts are vendored into assets/vendor (fetched once, then reused),
+# trimmed to what the templates use and minified. Every output file is
+# written to static/dist under a content-hashed name, so it can be cached
+# forever, with .gz/.br siblings next to it. manifest.json maps the logical
+# names the templates use to the hashed files. Files of earlier builds stay
+# for PRUNE_AGE, since cached pages and open tabs still point at them.
+
+VENDOR_DIR = 'assets/vendor'
+DIST_DIR = 'static/dist'
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+TEMPLATES_DIR = 'templates'
+
+GOOGLE_FONTS_URL = (
+    'https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700;900'
+    '&family=Bebas+Neue&family=Oswald:wght@400;600;700&family=Cinzel:wght@400;600;700&display=swap'
+)
+
+# logical name -> upstream URL; also what templates fall back to before a build
+VENDOR = {
+    'vendor/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons.css': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css',
+    'vendor/fonts.css': GOOGLE_FONTS_URL,
+}
+
+# Google Fonts only serves woff2 with unicode-range subsets to modern browsers
+FETCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+}
+
+# Of the per-script font subsets Google serves, the shop only needs these
+FONT_SUBSETS = ('latin',)
+
+# Responsive variants of the home page images
+IMAGE_SOURCES = 'static/images/home'
+IMAGE_WIDTHS = (480, 960, 1600)
+IMAGE_FORMATS = ('webp', 'jpg')
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+
+PRUNE_AGE = 7 * 24 * 3600  # seconds an earlier build's files are kept
+
+URL_RE = re.compile(r'url\((["\']?)([^)"\']+)\1\)')
+
+
+def _vendor_path(name):
+    return os.path.join(VENDOR_DIR, name.replace('/', os.sep))
+
+
+def fetch(url, name):
+    # Vendored copy of url, downloaded the first time only
+    path = _vendor_path(name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        request = urllib.request.Request(url, headers=FETCH_HEADERS)
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = response.read()
+        with open(path, 'wb') as f:
+            f.write(data)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def keep_font_subsets(css, subsets=FONT_SUBSETS):
+    # Google Fonts CSS labels each @font-face with a /* subset */ comment
+    blocks = re.findall(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})', css)
+    return '\n'.join(block for subset, block in blocks if subset in subsets)
+
+
+def used_icons(templates_dir=TEMPLATES_DIR):
+    icons = set()
+    for dirpath, _, filenames in os.walk(templates_dir):
+        for filename in filenames:
+            with open(os.path.join(dirpath, filename), encoding='utf-8') as f:
+                icons.update(re.findall(r'\bbi-([a-z0-9-]+)', f.read()))
+    return icons
+
+
+def keep_icons(css, icons):
+    # Drops the ::before rule of every icon the templates don't use and
+    # returns the trimmed CSS with the codepoints that are left
+    codepoints = set()
+
+    def rule(match):
+        if match.group(1) not in icons:
+            return ''
+        codepoints.add(int(match.group(2), 16))
+        return match.group(0)
+
+    css = re.sub(r'\.bi-([a-z0-9-]+)::before\s*\{\s*content:\s*"\\([0-9a-f]+)";?\s*\}', rule, css)
+    return css, codepoints
+
+
+def subset_font(data, codepoints):
+    # Glyph subset of a woff2 font; needs fontTools (and brotli for woff2).
+    # Without them the font is shipped whole.
+    try:
+        from fontTools import subset
+    except ImportError:
+        return data
+    options = subset.Options()
+    options.flavor = 'woff2'
+    font = subset.load_font(io.BytesIO(data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    subset.save_font(font, out, options)
+    return out.getvalue()
+
+
+class Build:
+
+    def __init__(self, dist_dir=DIST_DIR):
+        self.dist_dir = dist_dir
+        self.files = {}
+        self.images = {}
+        self.pruned = 0
+
+    def emit(self, name, data):
+        # Writes data under a fingerprinted name; returns the dist-relative path
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        rel = f"{stem}.{digest}{ext}"
+        path = os.path.join(self.dist_dir, rel.replace('/', os.sep))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if ext in COMPRESSIBLE:
+            precompress(path, data)
+        self.files[name] = rel
+        return rel
+
+    def css(self, name, url, css, font_filter=None):
+        # Vendors the fonts a stylesheet points at and rewrites its url()s to
+        # their fingerprinted copies, relative to the stylesheet
+        base = os.path.dirname(name)
+
+        def replace(match):
+            ref = match.group(2)
+            if ref.startswith('data:'):
+                return match.group(0)
+            ref_url = urllib.parse.urljoin(url, ref)
+            clean = urllib.parse.urlsplit(ref_url).path
+            font_name = f"vendor/fonts/{os.path.basename(clean)}"
+            data = fetch(ref_url, font_name)
+            if font_filter and font_name.endswith('.woff2'):
+                data = font_filter(data)
+            rel = self.emit(font_name, data)
+            return f"url({os.path.relpath(rel, base).replace(os.sep, '/')})"
+
+        css = URL_RE.sub(replace, css)
+        return self.emit(name, minify_css(css).encode())
+
+    def image(self, path):
+        name = os.path.relpath(path, 'static').replace(os.sep, '/')
+        slug = re.sub(r'[^a-z0-9]+', '-', os.path.splitext(os.path.basename(path))[0].lower()).strip('-')
+        stem = f"{os.path.dirname(name)}/{slug}"
+        variants = {fmt: [] for fmt in IMAGE_FORMATS}
+
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            widths = [w for w in IMAGE_WIDTHS if w < img.width] + [min(img.width, IMAGE_WIDTHS[-1])]
+            for width in sorted(set(widths)):
+                resized = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+                for fmt in IMAGE_FORMATS:
+                    buffer = io.BytesIO()
+                    if fmt == 'webp':
+                        resized.save(buffer, 'WEBP', quality=80, method=6)
+                    else:
+                        resized.save(buffer, 'JPEG', quality=80, optimize=True, progressive=True)
+                    rel = self.emit(f"{stem}-{width}.{fmt}", buffer.getvalue())
+                    variants[fmt].append([width, rel])
+
+        self.images[name] = variants
+
+    def write_manifest(self):
+        # Swapped in whole, so a running app never reads half a manifest
+        data = json.dumps({'files': self.files, 'images': self.images}, indent=1, sort_keys=True)
+        path = os.path.join(self.dist_dir, 'manifest.json')
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def outputs(self):
+        # dist-relative paths this build wrote, with their compressed siblings
+        paths = set(self.files.values())
+        return paths | {f"{p}{suffix}" for p in paths for suffix in ('.gz', '.br')}
+
+
+def precompress(path, data):
+    with open(f"{path}.gz", 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(f"{path}.br", 'wb') as f:
+        f.write(brotli.compress(data, quality=11))
+
+
+def prune(dist_dir, keep, max_age=PRUNE_AGE):
+    # Deletes files of earlier builds once they are older than max_age
+    cutoff = time.time() - max_age
+    removed = 0
+    for dirpath, _, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel = os.path.relpath(path, dist_dir).replace(os.sep, '/')
+            if rel != 'manifest.json' and rel not in keep and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def build(dist_dir=DIST_DIR):
+    # Builds into static/dist next to the earlier builds and returns the Build
+    os.makedirs(dist_dir, exist_ok=True)
+    out = Build(dist_dir)
+
+    for name in ('vendor/bootstrap.min.css', 'vendor/bootstrap.bundle.min.js'):
+        out.emit(name, fetch(VENDOR[name], name))
+
+    name = 'vendor/bootstrap-icons.css'
+    css, codepoints = keep_icons(fetch(VENDOR[name], name).decode(), used_icons())
+    out.css(name, VENDOR[name], css, font_filter=lambda data: subset_font(data, codepoints))
+
+    name = 'vendor/fonts.css'
+    out.css(name, VENDOR[name], keep_font_subsets(fetch(VENDOR[name], name).decode()))
+
+    for filename in sorted(os.listdir(IMAGE_SOURCES)):
+        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            out.image(os.path.join(IMAGE_SOURCES, filename))
+
+    out.write_manifest()
+    out.pruned = prune(dist_dir, out.outputs())
+    return out
+
+
+class Manifest:
+    # Runtime side: resolves logical names to fingerprinted files. Before the
+    # first build (no manifest) it points back at the CDN and the originals.
+    # A rebuild is picked up without a restart: the file is re-read when its
+    # mtime changes, checked at most every check_interval seconds.
+
+    def __init__(self, path=MANIFEST, check_interval=2):
+        self.path = path
+        self.check_interval = check_interval
+        self.files = {}
+        self.images = {}
+        self._mtime = None
+        self._checked_at = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.files = data.get('files', {})
+        self.images = data.get('images', {})
+        self._mtime = mtime
+
+    def file(self, name):
+        self._refresh()
+        return self.files.get(name)
+
+    def image(self, name):
+        # {fmt: [[width, path], ...]} or None
+        self._refresh()
+        return self.images.get(name)
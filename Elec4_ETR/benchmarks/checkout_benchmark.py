@@ -0,0 +1,160 @@
+# Hammers one SKU with concurrent checkouts and checks for overselling.
+#
+#   python benchmarks/checkout_benchmark.py [--clients 50] [--stock 20] [--qty 1]
+#
+# Every client is a throwaway user with the SKU in their cart. The old per-item
+# read-modify-write loop and place_order() are run against the same setup, then
+# all benchmark rows are removed again.
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+import MySQLdb
+import MySQLdb.cursors
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from order_placement import place_order, InsufficientStock
+
+
+def connect():
+    return MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ.get('MYSQL_DB', 'flask_ecommerce'),
+        cursorclass=MySQLdb.cursors.DictCursor
+    )
+
+
+def legacy_checkout(conn, user_id, product_ids):
+    # The loop checkout() used before: stock is read into Python, then written back
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO orders(user_id, payment_method, payment_proof)
+        VALUES(%s,%s,%s)
+    """, (user_id, 'Cash on Delivery', None))
+    order_id = cur.lastrowid
+    placeholders = ','.join(['%s'] * len(product_ids))
+    cur.execute(f"""
+        SELECT c.product_id, c.quantity, p.price, p.stock, p.name
+        FROM cart_items c
+        JOIN products p ON c.product_id = p.id
+        WHERE c.user_id=%s AND c.product_id IN ({placeholders})
+    """, (user_id, *product_ids))
+    for item in cur.fetchall():
+        if item['quantity'] > item['stock']:
+            conn.commit()
+            cur.close()
+            raise InsufficientStock([item])
+        cur.execute("UPDATE products SET stock=%s WHERE id=%s",
+                    (item['stock'] - item['quantity'], item['product_id']))
+        cur.execute("""
+            INSERT INTO order_items(order_id, product_id, quantity, price)
+            VALUES(%s,%s,%s,%s)
+        """, (order_id, item['product_id'], item['quantity'], item['price']))
+        cur.execute("DELETE FROM cart_items WHERE user_id=%s AND product_id=%s",
+                    (user_id, item['product_id']))
+    conn.commit()
+    cur.close()
+    return order_id
+
+
+def setup(cur, clients, stock, qty):
+    tag = uuid.uuid4().hex[:8]
+    cur.execute("INSERT INTO categories (name) VALUES (%s)", (f"bench-{tag}",))
+    category_id = cur.lastrowid
+    cur.execute("""
+        INSERT INTO products
+        (name, description, price, stock, condition_type, category_id, image)
+        VALUES (%s,%s,%s,%s,%s,%s,%s)
+    """, (f"bench-{tag}", '', 100, stock, 'Brand New', category_id, None))
+    product_id = cur.lastrowid
+    user_ids = []
+    for i in range(clients):
+        cur.execute("INSERT INTO users (fullname, email, password) VALUES (%s, %s, %s)",
+                    (f"bench {i}", f"bench-{tag}-{i}@example.invalid", '!'))
+        user_ids.append(cur.lastrowid)
+    cur.executemany("INSERT INTO cart_items(user_id, product_id, quantity) VALUES(%s,%s,%s)",
+                    [(u, product_id, qty) for u in user_ids])
+    return category_id, product_id, user_ids
+
+
+def teardown(cur, category_id, product_id, user_ids):
+    placeholders = ','.join(['%s'] * len(user_ids))
+    cur.execute(f"DELETE oi FROM order_items oi JOIN orders o ON o.id = oi.order_id WHERE o.user_id IN ({placeholders})", user_ids)
+    cur.execute(f"DELETE FROM orders WHERE user_id IN ({placeholders})", user_ids)
+    cur.execute(f"DELETE FROM cart_items WHERE user_id IN ({placeholders})", user_ids)
+    cur.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids)
+    cur.execute("DELETE FROM products WHERE id=%s", (product_id,))
+    cur.execute("DELETE FROM categories WHERE id=%s", (category_id,))
+
+
+def hammer(name, checkout, clients, stock, qty):
+    admin = connect()
+    cur = admin.cursor()
+    category_id, product_id, user_ids = setup(cur, clients, stock, qty)
+    admin.commit()
+
+    results = {'ok': 0, 'short': 0, 'error': 0}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(clients)
+
+    def client(user_id):
+        conn = connect()
+        start_gate.wait()
+        try:
+            checkout(conn, user_id, [product_id])
+            outcome = 'ok'
+        except InsufficientStock:
+            outcome = 'short'
+        except MySQLdb.Error:
+            conn.rollback()
+            outcome = 'error'
+        finally:
+            conn.close()
+        with lock:
+            results[outcome] += 1
+
+    threads = [threading.Thread(target=client, args=(u,)) for u in user_ids]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    cur.execute("SELECT stock FROM products WHERE id=%s", (product_id,))
+    final_stock = cur.fetchone()['stock']
+    cur.execute("SELECT COALESCE(SUM(quantity), 0) AS sold FROM order_items WHERE product_id=%s", (product_id,))
+    sold = int(cur.fetchone()['sold'])
+
+    teardown(cur, category_id, product_id, user_ids)
+    admin.commit()
+    cur.close()
+    admin.close()
+
+    oversold = max(0, sold - stock)
+    print(f"{name:<14}{elapsed * 1000:>10.1f}{results['ok']:>8}{results['short']:>8}"
+          f"{results['error']:>8}{sold:>8}{final_stock:>8}{oversold:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--stock', type=int, default=20)
+    parser.add_argument('--qty', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, stock {args.stock}, {args.qty} per order")
+    print(f"{'path':<14}{'ms':>10}{'ok':>8}{'short':>8}{'error':>8}{'sold':>8}{'stock':>8}{'oversold':>10}")
+    hammer('legacy', legacy_checkout, args.clients, args.stock, args.qty)
+    hammer('place_order',
+           lambda conn, user_id, ids: place_order(conn, user_id, 'Cash on Delivery', None, ids),
+           args.clients, args.stock, args.qty)
+
+
+if __name__ == '__main__':
+    main()
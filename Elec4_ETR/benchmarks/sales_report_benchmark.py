@@ -0,0 +1,83 @@
+# Times sales report labeling over multi-year histories: the per-row
+# strptime/strftime loop admin_sales() and export_sales() used to carry,
+# against sales_report.build_sales_report(). Needs no database.
+#
+#   python benchmarks/sales_report_benchmark.py [--years 1,5,20] [--runs 5]
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from sales_report import build_sales_report, period_label
+
+
+def legacy_format(rows, report_type):
+    formatted = []
+    for r in rows:
+        period = r['period']
+        if report_type == 'daily':
+            period = datetime.strptime(str(period), "%Y-%m-%d").strftime("%b %d, %Y")
+        elif report_type == 'weekly':
+            year = int(str(period)[:4])
+            week = int(str(period)[4:])
+            monday = datetime.strptime(f'{year}-W{week}-1', "%Y-W%W-%w")
+            sunday = monday + timedelta(days=6)
+            period = f"{monday.strftime('%b %d')} – {sunday.strftime('%b %d, %Y')}"
+        else:
+            period = datetime.strptime(str(period), "%Y-%m").strftime("%B %Y")
+        formatted.append({
+            'period': period,
+            'total_orders': r['total_orders'],
+            'total_sales': r['total_sales'] if r['total_sales'] is not None else 0
+        })
+    return formatted
+
+
+def history(years, report_type):
+    # Rows shaped like sales_rollup.fetch_report() output, newest first
+    end = date(2026, 1, 1)
+    days = [end - timedelta(days=i) for i in range(365 * years)]
+    if report_type == 'daily':
+        periods = days
+    elif report_type == 'weekly':
+        periods = sorted({d.isocalendar()[0] * 100 + d.isocalendar()[1] for d in days}, reverse=True)
+    else:
+        periods = sorted({d.strftime('%Y-%m') for d in days}, reverse=True)
+    return [{'period': p, 'total_orders': 3, 'total_sales': 1500} for p in periods]
+
+
+def best_of(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', default='1,5,20')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'type':<9}{'years':>6}{'rows':>8}{'legacy ms':>12}{'cold ms':>10}{'warm ms':>10}")
+    for years in [int(y) for y in args.years.split(',')]:
+        for report_type in ('daily', 'weekly', 'monthly'):
+            rows = history(years, report_type)
+            legacy_ms = best_of(lambda: legacy_format(rows, report_type), args.runs)
+
+            def cold():
+                period_label.cache_clear()
+                build_sales_report(rows, report_type)
+
+            cold_ms = best_of(cold, args.runs)
+            warm_ms = best_of(lambda: build_sales_report(rows, report_type), args.runs)
+            print(f"{report_type:<9}{years:>6}{len(rows):>8}{legacy_ms:>12.2f}{cold_ms:>10.2f}{warm_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
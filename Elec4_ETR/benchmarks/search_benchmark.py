@@ -0,0 +1,145 @@
+# Compares product search latency: leading-wildcard LIKE vs the FULLTEXT path
+# used by search.py, on scratch tables of 10k, 100k and 1M products.
+#
+#   python benchmarks/search_benchmark.py [--sizes 10000,100000] [--runs 20]
+#
+# Connects with the same settings as app.py (override with MYSQL_* env vars)
+# and only touches the bench_products / bench_categories tables.
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import MySQLdb
+import MySQLdb.cursors
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from search import search_clause
+
+BRANDS = ['Canon', 'Nikon', 'Pentax', 'Olympus', 'Minolta', 'Leica', 'Yashica', 'Fujifilm', 'Kodak', 'Polaroid']
+MODELS = ['AE-1', 'FM2', 'K1000', 'OM-1', 'X-700', 'M6', 'Electro 35', 'Instax', 'Retina', 'SX-70']
+WORDS = ['film', 'rangefinder', 'slr', 'lens', 'vintage', 'classic', 'mint', 'shutter', 'tested', 'leather', 'strap', 'manual']
+CATEGORIES = ['Film Cameras', 'Rangefinders', 'Instant Cameras', 'Lenses', 'Accessories']
+TERMS = ['canon', 'rangefinder', 'lei', 'film slr', 'instant']
+
+
+def connect():
+    return MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ.get('MYSQL_DB', 'flask_ecommerce'),
+        cursorclass=MySQLdb.cursors.DictCursor
+    )
+
+
+def setup(cur, size):
+    cur.execute("DROP TABLE IF EXISTS bench_products")
+    cur.execute("DROP TABLE IF EXISTS bench_categories")
+    cur.execute("""
+        CREATE TABLE bench_categories (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE bench_products (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            brand VARCHAR(100),
+            description TEXT,
+            category_id INT NOT NULL
+        )
+    """)
+    cur.executemany("INSERT INTO bench_categories (name) VALUES (%s)", [(c,) for c in CATEGORIES])
+
+    rng = random.Random(size)
+    chunk = []
+    for i in range(size):
+        brand = rng.choice(BRANDS)
+        chunk.append((
+            f"{brand} {rng.choice(MODELS)} #{i}",
+            brand,
+            ' '.join(rng.choice(WORDS) for _ in range(12)),
+            rng.randint(1, len(CATEGORIES))
+        ))
+        if len(chunk) == 5000:
+            cur.executemany("""
+                INSERT INTO bench_products (name, brand, description, category_id)
+                VALUES (%s,%s,%s,%s)
+            """, chunk)
+            chunk = []
+    if chunk:
+        cur.executemany("""
+            INSERT INTO bench_products (name, brand, description, category_id)
+            VALUES (%s,%s,%s,%s)
+        """, chunk)
+
+    cur.execute("ALTER TABLE bench_products ADD FULLTEXT INDEX ft_search (name, brand, description)")
+    cur.execute("ALTER TABLE bench_categories ADD FULLTEXT INDEX ft_name (name)")
+
+
+def time_query(cur, sql, params, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(cur, runs):
+    base = """
+        FROM bench_products p
+        JOIN bench_categories c ON p.category_id = c.id
+        WHERE 1=1
+    """
+    results = []
+    for term in TERMS:
+        like_ms = time_query(
+            cur,
+            "SELECT p.id " + base + " AND p.name LIKE %s LIMIT 20",
+            [f"%{term}%"],
+            runs
+        )
+        where_sql, where_params, score_sql, score_params = search_clause(term, 'p', 'c')
+        fulltext_ms = time_query(
+            cur,
+            f"SELECT p.id, {score_sql} AS relevance " + base + where_sql + " ORDER BY relevance DESC LIMIT 20",
+            score_params + where_params,
+            runs
+        )
+        results.append((term, like_ms, fulltext_ms))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            print(f"Loading {size:,} products...")
+            setup(cur, size)
+            conn.commit()
+            print(f"{'term':<14}{'LIKE ms':>12}{'FULLTEXT ms':>14}{'speedup':>10}")
+            for term, like_ms, fulltext_ms in run(cur, args.runs):
+                print(f"{term:<14}{like_ms:>12.2f}{fulltext_ms:>14.2f}{like_ms / fulltext_ms:>9.1f}x")
+            print()
+    finally:
+        cur.execute("DROP TABLE IF EXISTS bench_products")
+        cur.execute("DROP TABLE IF EXISTS bench_categories")
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
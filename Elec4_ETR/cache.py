@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    # Keys may come from user input (search text), so at most max_entries are
+    # kept: expired entries go first, then the least recently used. delete()
+    # and clear() start a new generation, so get_or_set() does not store a
+    # value whose load was invalidated while it ran.
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, generation=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at < now]:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get_or_set(self, key, loader, ttl=None):
+        value = self.get(key)
+        if value is None:
+            generation = self.generation
+            value = loader()
+            self.set(key, value, ttl, generation)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
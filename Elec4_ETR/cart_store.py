@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+CART_TTL = 3600
+FLUSH_DELAY = 2.0
+LOADED = '__loaded__'
+
+
+class MemoryStore:
+    # In-process stand-in for the few Redis hash commands the cart uses, with
+    # the same string-in, string-out behaviour as redis-py's decode_responses
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name):
+        expires_at = self._expires.get(name)
+        if expires_at is not None and expires_at < time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return self._data.get(name)
+
+    def exists(self, name):
+        with self._lock:
+            return 1 if self._live(name) is not None else 0
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._live(name) or {})
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            h = self._live(name)
+            if h is None:
+                h = self._data[name] = {}
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            for k, v in items.items():
+                h[str(k)] = str(v)
+            return len(items)
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            h = self._live(name)
+            if h is None:
+                h = self._data[name] = {}
+            value = int(h.get(str(key), 0)) + amount
+            h[str(key)] = str(value)
+            return value
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            h = self._live(name) or {}
+            return sum(1 for k in keys if h.pop(str(k), None) is not None)
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                removed += self._data.pop(name, None) is not None
+                self._expires.pop(name, None)
+            return removed
+
+    def expire(self, name, seconds):
+        with self._lock:
+            if self._live(name) is None:
+                return False
+            self._expires[name] = time.monotonic() + seconds
+            return True
+
+
+def make_store(url=None):
+    if url:
+        import redis
+        return redis.Redis.from_url(url, decode_responses=True)
+    return MemoryStore()
+
+
+class CartService:
+    # Hot carts live in the store as hash cart:<user_id> of product_id -> qty.
+    # add_to_cart writes through with one upsert. Quantity changes from the
+    # cart page are held in `pending` and flushed to MySQL in one batch shortly
+    # after, so rapid clicks on the same item become one write. A user's lock
+    # is held from taking their pending changes until they are committed, so
+    # remove() and checkout never run between the two and get overwritten.
+    # The hot copy is only trusted when the store is shared (Redis): an
+    # in-process MemoryStore can't see what other workers changed, so then
+    # carts are always read from MySQL.
+
+    def __init__(self, store, standalone_cursor, flush_delay=FLUSH_DELAY):
+        self.store = store
+        self.shared = not isinstance(store, MemoryStore)
+        self.standalone_cursor = standalone_cursor
+        self.flush_delay = flush_delay
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._user_locks = {}  # user_id -> [lock, holders and waiters]
+        self._timer = None
+
+    def _key(self, user_id):
+        return f"cart:{user_id}"
+
+    def _acquire(self, user_id):
+        with self._lock:
+            entry = self._user_locks.setdefault(user_id, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def _release(self, user_id):
+        # The lock is dropped once nobody holds or waits for it
+        with self._lock:
+            entry = self._user_locks[user_id]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user_id]
+
+    @contextmanager
+    def _user_lock(self, user_id):
+        self._acquire(user_id)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def quantities(self, cur, user_id):
+        key = self._key(user_id)
+        cart = self.store.hgetall(key) if self.shared else {}
+        if LOADED not in cart:
+            cur.execute("""
+                SELECT product_id, quantity FROM cart_items
+                WHERE user_id=%s
+            """, (user_id,))
+            cart = {str(r['product_id']): str(r['quantity']) for r in cur.fetchall()}
+            with self._lock:
+                for (u, p), qty in self.pending.items():
+                    if u == user_id:
+                        if qty > 0:
+                            cart[str(p)] = str(qty)
+                        else:
+                            cart.pop(str(p), None)
+            if not self.shared:
+                return {int(p): int(q) for p, q in cart.items()}
+            self.store.hset(key, mapping={**cart, LOADED: 1})
+        self.store.expire(key, CART_TTL)
+        return {int(p): int(q) for p, q in cart.items() if p != LOADED}
+
+    def add(self, cur, user_id, product_id, quantity=1):
+        key = self._key(user_id)
+        with self._lock:
+            if (user_id, product_id) in self.pending:
+                # Folded into the write that is already queued: no round trip
+                self.pending[(user_id, product_id)] += quantity
+                if self.store.exists(key):
+                    self.store.hincrby(key, product_id, quantity)
+                return
+
+        cur.execute("""
+            INSERT INTO cart_items(user_id, product_id, quantity)
+            VALUES(%s,%s,%s)
+            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """, (user_id, product_id, quantity))
+        if self.store.exists(key):
+            self.store.hincrby(key, product_id, quantity)
+
+    def set_quantity(self, user_id, product_id, quantity):
+        key = self._key(user_id)
+        with self._lock:
+            self.pending[(user_id, product_id)] = quantity
+            if self.store.exists(key):
+                if quantity > 0:
+                    self.store.hset(key, product_id, quantity)
+                else:
+                    self.store.hdel(key, product_id)
+            self._schedule_flush()
+
+    def remove(self, cur, user_id, product_id):
+        # Commits on the caller's connection before letting go of the lock
+        with self._user_lock(user_id):
+            with self._lock:
+                self.pending.pop((user_id, product_id), None)
+            cur.execute("""
+                DELETE FROM cart_items
+                WHERE user_id=%s AND product_id=%s
+            """, (user_id, product_id))
+            cur.connection.commit()
+        self.store.hdel(self._key(user_id), product_id)
+
+    def forget(self, user_id):
+        self.store.delete(self._key(user_id))
+
+    def _take(self, user_ids):
+        # Caller holds the locks of user_ids
+        with self._lock:
+            batch = {k: v for k, v in self.pending.items() if k[0] in user_ids}
+            for k in batch:
+                del self.pending[k]
+            return batch
+
+    def _write(self, cur, batch):
+        upserts = [(u, p, q) for (u, p), q in batch.items() if q > 0]
+        deletes = [(u, p) for (u, p), q in batch.items() if q <= 0]
+        if upserts:
+            cur.executemany("""
+                INSERT INTO cart_items(user_id, product_id, quantity)
+                VALUES(%s,%s,%s)
+                ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+            """, upserts)
+        if deletes:
+            cur.executemany("""
+                DELETE FROM cart_items
+                WHERE user_id=%s AND product_id=%s
+            """, deletes)
+
+    def flush(self, cur, user_id):
+        # Writes and commits one user's pending changes on the caller's
+        # connection, e.g. right before checkout reads cart_items. Waits for a
+        # background flush of the same user to commit first.
+        with self._user_lock(user_id):
+            self._write(cur, self._take({user_id}))
+            cur.connection.commit()
+
+    def flush_all(self):
+        with self._lock:
+            self._timer = None
+            user_ids = sorted({u for u, _ in self.pending})
+        if not user_ids:
+            return
+
+        # Always taken in user order, and callers only ever hold one
+        for user_id in user_ids:
+            self._acquire(user_id)
+        try:
+            batch = self._take(set(user_ids))
+            with self.standalone_cursor() as cur:
+                self._write(cur, batch)
+                cur.connection.commit()
+        except Exception:
+            log.exception("Cart flush failed, will retry")
+            with self._lock:
+                # Newer changes made while flushing win over the failed batch
+                for k, v in batch.items():
+                    self.pending.setdefault(k, v)
+                self._schedule_flush()
+        finally:
+            for user_id in user_ids:
+                self._release(user_id)
+
+    def _schedule_flush(self):
+        # Caller holds self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush_all)
+            self._timer.daemon = True
+            self._timer.start()
@@ -0,0 +1,151 @@
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = 3600  # seconds
+
+# categories.product_count is kept in step with products by the writes that
+# add, remove or move products (always in the same transaction), so category
+# pages read it instead of grouping products. reconcile() repairs any drift.
+
+
+class MissingCategory(Exception):
+    def __init__(self, category_id):
+        super().__init__(f"Category {category_id} does not exist")
+        self.category_id = category_id
+
+
+def _in(ids):
+    return ','.join(['%s'] * len(ids))
+
+
+def adjust(cur, category_id, delta):
+    cur.execute(
+        "UPDATE categories SET product_count = product_count + %s WHERE id=%s",
+        (delta, category_id)
+    )
+
+
+def move(cur, old_category_id, new_category_id):
+    if old_category_id != new_category_id:
+        adjust(cur, old_category_id, -1)
+        adjust(cur, new_category_id, 1)
+
+
+def recount(cur, category_ids):
+    # Exact counts for the given categories, from the category_id index
+    category_ids = sorted(set(category_ids))
+    if not category_ids:
+        return
+    cur.execute(f"""
+        UPDATE categories c
+        SET c.product_count = (SELECT COUNT(*) FROM products p WHERE p.category_id = c.id)
+        WHERE c.id IN ({_in(category_ids)})
+    """, category_ids)
+
+
+def reconcile(cur):
+    # Fixes every category whose counter drifted; returns how many did
+    cur.execute("""
+        UPDATE categories c
+        LEFT JOIN (
+            SELECT category_id, COUNT(*) AS total
+            FROM products
+            GROUP BY category_id
+        ) p ON p.category_id = c.id
+        SET c.product_count = COALESCE(p.total, 0)
+        WHERE c.product_count <> COALESCE(p.total, 0)
+    """)
+    return cur.rowcount
+
+
+def _lock(cur, category_ids):
+    # Products can't be added to a locked category until we commit
+    cur.execute(f"SELECT id FROM categories WHERE id IN ({_in(category_ids)}) FOR UPDATE", category_ids)
+    return {row['id'] for row in cur.fetchall()}
+
+
+def move_products(cur, source_ids, target_id):
+    # Moves every product in source_ids to target_id in one statement.
+    # Returns the number of products moved; raises MissingCategory if the
+    # target is gone (nothing has been changed then).
+    source_ids = sorted(set(source_ids) - {target_id})
+    if not source_ids:
+        return 0
+    if target_id not in _lock(cur, source_ids + [target_id]):
+        raise MissingCategory(target_id)
+    cur.execute(f"""
+        UPDATE products SET category_id=%s
+        WHERE category_id IN ({_in(source_ids)})
+    """, [target_id, *source_ids])
+    moved = cur.rowcount
+    recount(cur, source_ids + [target_id])
+    return moved
+
+
+def merge(cur, source_ids, target_id):
+    # Moves the products over, then drops the emptied source categories
+    moved = move_products(cur, source_ids, target_id)
+    source_ids = sorted(set(source_ids) - {target_id})
+    if source_ids:
+        cur.execute(f"DELETE FROM categories WHERE id IN ({_in(source_ids)})", source_ids)
+    return moved
+
+
+def delete_empty(cur, category_ids):
+    # Deletes the categories that have no products and returns the ids that
+    # were kept. The check is part of the DELETE, so a product added
+    # meanwhile can't be orphaned.
+    category_ids = sorted(set(category_ids))
+    if not category_ids:
+        return []
+    _lock(cur, category_ids)
+    cur.execute(f"""
+        DELETE c FROM categories c
+        WHERE c.id IN ({_in(category_ids)})
+          AND NOT EXISTS (SELECT 1 FROM products p WHERE p.category_id = c.id)
+    """, category_ids)
+    cur.execute(f"SELECT id FROM categories WHERE id IN ({_in(category_ids)})", category_ids)
+    return [row['id'] for row in cur.fetchall()]
+
+
+class CountReconciler:
+    # Runs reconcile() every interval seconds on its own pooled connection.
+    # on_fixed is called after a pass that repaired anything.
+
+    def __init__(self, standalone_cursor, interval=RECONCILE_INTERVAL, on_fixed=None):
+        self.standalone_cursor = standalone_cursor
+        self.interval = interval
+        self.on_fixed = on_fixed
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._timer is None:
+                self._schedule()
+
+    def run(self):
+        with self.standalone_cursor() as cur:
+            fixed = reconcile(cur)
+            cur.connection.commit()
+        if fixed:
+            log.warning("Reconciled product counts of %s categories", fixed)
+            if self.on_fixed:
+                self.on_fixed()
+        return fixed
+
+    def _tick(self):
+        try:
+            self.run()
+        except Exception:
+            log.exception("Category count reconciliation failed")
+        with self._lock:
+            self._schedule()
+
+    def _schedule(self):
+        # Caller holds self._lock
+        self._timer = threading.Timer(self.interval, self._tick)
+        self._timer.daemon = True
+        self._timer.start()
@@ -0,0 +1,239 @@
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# WSGI middleware that compresses responses (brotli when the module is
+# installed, else gzip) and gives GET pages a weak ETag so an unchanged page
+# is answered with 304. Responses with a Content-Length are buffered, hashed
+# and compressed in one go; streamed ones (CSV exports) are compressed chunk
+# by chunk and flushed as they go, without an ETag. A view opts out by
+# setting environ[SKIP] (see no_compression in app.py), e.g. for send_file
+# downloads that should go out untouched.
+
+SKIP = 'compression.skip'
+
+MIN_SIZE = 1024  # smaller bodies aren't worth compressing
+MAX_BUFFER = 8 * 1024 * 1024  # larger bodies are streamed instead of buffered
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+
+def accepted_encodings(header):
+    # {coding: q} from an Accept-Encoding header
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate(header):
+    codings = accepted_encodings(header or '')
+    for coding in (('br',) if brotli else ()) + ('gzip',):
+        if codings.get(coding, codings.get('*', 0)) > 0:
+            return coding
+    return None
+
+
+def encoder(coding):
+    # (compress_chunk, finish) for one response; every chunk is flushed so a
+    # stream reaches the client as it is produced
+    if coding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (lambda data: compressor.process(data) + compressor.flush()), compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def compress(data, coding):
+    chunk, finish = encoder(coding)
+    return chunk(data) + finish()
+
+
+def weak_etag(body):
+    return f'W/"{hashlib.sha1(body).hexdigest()}"'
+
+
+def etag_matches(header, etag):
+    # Weak comparison, as If-None-Match requires
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag[2:] in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, min_size=MIN_SIZE, max_buffer=MAX_BUFFER):
+        self.app = app
+        self.min_size = min_size
+        self.max_buffer = max_buffer
+
+    def __call__(self, environ, start_response):
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers]
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        chunks = iter(app_iter)
+        if not captured:
+            # Apps may call start_response on their first chunk
+            first = next(chunks, None)
+            if first is not None:
+                written.append(first)
+        status, headers = captured
+
+        skip = environ.get(SKIP) or not status.startswith('200')
+        method = environ.get('REQUEST_METHOD')
+        content_type = _header(headers, 'Content-Type') or ''
+        cache_control = _header(headers, 'Cache-Control') or ''
+        length = _header(headers, 'Content-Length')
+
+        can_compress = (
+            not skip
+            and method != 'HEAD'
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and _header(headers, 'Content-Encoding') is None
+            and _header(headers, 'Content-Range') is None
+            and 'no-transform' not in cache_control
+        )
+        can_tag = (
+            not skip
+            and method == 'GET'
+            and _header(headers, 'ETag') is None
+            and 'no-store' not in cache_control
+        )
+        buffered = length is not None and int(length) <= self.max_buffer
+        coding = negotiate(environ.get('HTTP_ACCEPT_ENCODING')) if can_compress else None
+
+        if can_compress:
+            _add_vary(headers, 'Accept-Encoding')
+        if not (coding or (can_tag and buffered)):
+            start_response(status, headers)
+            return _chain(written, chunks, app_iter) if written else app_iter
+
+        if buffered:
+            try:
+                body = b''.join(written) + b''.join(chunks)
+            finally:
+                _close(app_iter)
+            return self._buffered(environ, start_response, status, headers, body, coding, can_tag)
+        return self._streamed(start_response, status, headers, written, chunks, app_iter, coding)
+
+    def _buffered(self, environ, start_response, status, headers, body, coding, can_tag):
+        if can_tag:
+            etag = weak_etag(body)
+            headers.append(('ETag', etag))
+            if etag_matches(environ.get('HTTP_IF_NONE_MATCH'), etag):
+                headers[:] = [(k, v) for k, v in headers if k.lower() not in ('content-length', 'content-type')]
+                start_response('304 Not Modified', headers)
+                return []
+
+        if coding and len(body) >= self.min_size:
+            body = compress(body, coding)
+            _set_encoded(headers, coding)
+            headers.append(('Content-Length', str(len(body))))
+        start_response(status, headers)
+        return [body]
+
+    def _streamed(self, start_response, status, headers, written, chunks, app_iter, coding):
+        # Holds back the first min_size bytes: a short body goes out as is
+        head = list(written)
+        size = sum(map(len, head))
+        try:
+            while size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    _close(app_iter)
+                    start_response(status, headers)
+                    return head
+                head.append(chunk)
+                size += len(chunk)
+        except BaseException:
+            _close(app_iter)
+            raise
+
+        _set_encoded(headers, coding)
+        start_response(status, headers)
+        return self._encode(head, chunks, app_iter, coding)
+
+    def _encode(self, head, chunks, app_iter, coding):
+        chunk, finish = encoder(coding)
+        try:
+            yield chunk(b''.join(head))
+            for data in chunks:
+                if data:
+                    yield chunk(data)
+            yield finish()
+        finally:
+            _close(app_iter)
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _add_vary(headers, field):
+    for i, (key, value) in enumerate(headers):
+        if key.lower() == 'vary':
+            if field.lower() not in (v.strip().lower() for v in value.split(',')):
+                headers[i] = (key, f'{value}, {field}')
+            return
+    headers.append(('Vary', field))
+
+
+def _set_encoded(headers, coding):
+    # The encoded body has its own length, and a strong ETag no longer
+    # matches it byte for byte
+    encoded = []
+    for key, value in headers:
+        if key.lower() == 'content-length':
+            continue
+        if key.lower() == 'etag' and not value.startswith('W/'):
+            value = f'W/{value}'
+        encoded.append((key, value))
+    encoded.append(('Content-Encoding', coding))
+    headers[:] = encoded
+
+
+def _chain(written, chunks, app_iter):
+    try:
+        yield from written
+        yield from chunks
+    finally:
+        _close(app_iter)
+
+
+def _close(app_iter):
+    if hasattr(app_iter, 'close'):
+        app_iter.close()
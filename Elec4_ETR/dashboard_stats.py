@@ -0,0 +1,80 @@
+import logging
+import threading
+from datetime import datetime
+
+from jobs import submit
+
+log = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60  # seconds between scheduled refreshes
+
+
+def compute_stats(cur):
+    # Every dashboard number in one round trip. Today's revenue comes from the
+    # sales_daily rollup, so it follows the same statuses as the sales reports.
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM orders WHERE status = 'Pending') AS pending_orders,
+            (SELECT COALESCE(SUM(total_sales), 0) FROM sales_daily WHERE day = CURDATE()) AS today_revenue,
+            (SELECT COUNT(*) FROM stock_watch WHERE level = 'low') AS low_stock,
+            (SELECT COUNT(*) FROM stock_watch WHERE level = 'sold_out') AS sold_out,
+            (SELECT COUNT(*) FROM products) AS products,
+            (SELECT COUNT(*) FROM categories) AS categories,
+            (SELECT COUNT(*) FROM users WHERE is_active = 1 AND role <> 'admin') AS active_users
+    """)
+    return cur.fetchone()
+
+
+class StatsSnapshot:
+    # Dashboard numbers computed off-request into one in-memory dict, so the
+    # dashboard reads them in O(1). A timer refreshes the snapshot every
+    # interval seconds; invalidate() queues an early refresh after writes that
+    # move the numbers. Readers always see the last complete snapshot.
+
+    def __init__(self, standalone_cursor, interval=REFRESH_INTERVAL):
+        self.standalone_cursor = standalone_cursor
+        self.interval = interval
+        self._snapshot = None
+        self._queued = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._timer is None:
+                self._schedule()
+        if self._snapshot is None:
+            # Nothing computed yet (first request after start-up)
+            self.refresh()
+        return self._snapshot
+
+    def invalidate(self):
+        # Several writes in a row share one queued refresh
+        with self._lock:
+            if self._queued:
+                return
+            self._queued = True
+        submit(self.refresh)
+
+    def refresh(self):
+        # Cleared first, so a write that lands mid-refresh queues another one
+        with self._lock:
+            self._queued = False
+        with self.standalone_cursor() as cur:
+            stats = dict(compute_stats(cur))
+        stats['computed_at'] = datetime.now()
+        self._snapshot = stats
+
+    def _tick(self):
+        try:
+            self.refresh()
+        except Exception:
+            log.exception("Dashboard stats refresh failed")
+        with self._lock:
+            self._schedule()
+
+    def _schedule(self):
+        # Caller holds self._lock
+        self._timer = threading.Timer(self.interval, self._tick)
+        self._timer.daemon = True
+        self._timer.start()
@@ -0,0 +1,247 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=10, recycle=3600, timeout=30, ping_after=30):
+        # connect: factory for a new DB-API connection
+        # size: most connections open at once, idle or in use
+        # recycle: close connections older than this many seconds
+        # timeout: seconds to wait for a free connection before PoolTimeout
+        # ping_after: health-check connections idle for longer than this
+        self._connect = connect
+        self.size = size
+        self.recycle = recycle
+        self.timeout = timeout
+        self.ping_after = ping_after
+
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+
+        self.in_use = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.failed_checks = 0
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    entry = None
+                    break
+
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                self._cond.wait(remaining)
+
+            self.in_use += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - started
+
+        # Connecting and pinging happen outside the lock
+        try:
+            if entry is None:
+                entry = self._new()
+            else:
+                entry = self._check(entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+
+        return entry
+
+    def release(self, entry):
+        discard = False
+        try:
+            # Never hand the next request an open transaction
+            entry.conn.rollback()
+        except MySQLdb.Error:
+            discard = True
+
+        recycle = not discard and time.monotonic() - entry.created_at > self.recycle
+        if discard or recycle:
+            self._close(entry)
+        else:
+            entry.last_used = time.monotonic()
+
+        with self._cond:
+            if recycle:
+                self.recycled += 1
+                discard = True
+            self.in_use -= 1
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 4),
+                'avg_wait_time': round(self.wait_time / self.waits, 4) if self.waits else 0,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'recycled': self.recycled,
+                'failed_checks': self.failed_checks,
+            }
+
+    def _new(self):
+        entry = PooledConnection(self._connect())
+        with self._cond:
+            self.created += 1
+        return entry
+
+    def _check(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at > self.recycle:
+            with self._cond:
+                self.recycled += 1
+            self._close(entry)
+            return self._new()
+
+        if now - entry.last_used > self.ping_after:
+            try:
+                entry.conn.ping()
+            except MySQLdb.Error:
+                with self._cond:
+                    self.failed_checks += 1
+                self._close(entry)
+                return self._new()
+
+        return entry
+
+    def _close(self, entry):
+        try:
+            entry.conn.close()
+        except MySQLdb.Error:
+            pass
+
+
+class MySQLPool:
+    # Drop-in for flask_mysqldb.MySQL: mysql.connection is one pooled
+    # connection per request, returned to the pool on app context teardown.
+
+    def __init__(self, app=None):
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8')
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_POOL_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_RECYCLE', 3600)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 30)
+        app.config.setdefault('MYSQL_POOL_PING_AFTER', 30)
+
+        config = app.config
+
+        def connect():
+            kwargs = {
+                'host': config['MYSQL_HOST'],
+                'port': config['MYSQL_PORT'],
+                'charset': config['MYSQL_CHARSET'],
+            }
+            if config['MYSQL_USER']:
+                kwargs['user'] = config['MYSQL_USER']
+            if config['MYSQL_PASSWORD']:
+                kwargs['passwd'] = config['MYSQL_PASSWORD']
+            if config['MYSQL_DB']:
+                kwargs['db'] = config['MYSQL_DB']
+            if config['MYSQL_CURSORCLASS']:
+                kwargs['cursorclass'] = getattr(MySQLdb.cursors, config['MYSQL_CURSORCLASS'])
+            return MySQLdb.connect(**kwargs)
+
+        self.pool = ConnectionPool(
+            connect,
+            size=config['MYSQL_POOL_SIZE'],
+            recycle=config['MYSQL_POOL_RECYCLE'],
+            timeout=config['MYSQL_POOL_TIMEOUT'],
+            ping_after=config['MYSQL_POOL_PING_AFTER']
+        )
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def connection(self):
+        if 'mysql_entry' not in g:
+            g.mysql_entry = self.pool.acquire()
+        return g.mysql_entry.conn
+
+    @contextmanager
+    def cursor(self):
+        cur = self.connection.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    @contextmanager
+    def standalone_cursor(self, server_side=False):
+        # A cursor on its own pooled connection, for work that runs outside the
+        # request (background jobs, streamed responses). server_side cursors
+        # fetch rows as they are iterated instead of buffering the result.
+        entry = self.pool.acquire()
+        try:
+            if server_side:
+                cur = entry.conn.cursor(MySQLdb.cursors.SSDictCursor)
+            else:
+                cur = entry.conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+        finally:
+            self.pool.release(entry)
+
+    def teardown(self, exception):
+        entry = g.pop('mysql_entry', None)
+        if entry is not None:
+            self.pool.release(entry)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import threading
+
+# Rendered exports on disk, keyed by (report type, format, watermark). The
+# watermark changes whenever sales_daily does, so a cached file is never stale;
+# old files just age out of the size-bounded LRU.
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'sales_export_cache')
+MAX_BYTES = 256 * 1024 * 1024
+MAX_FILES = 200
+
+_lock = threading.Lock()
+
+
+def cache_path(report_type, fmt, watermark):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, f"{report_type}-{watermark}.{fmt}")
+
+
+def lookup(report_type, fmt, watermark):
+    path = cache_path(report_type, fmt, watermark)
+    try:
+        os.utime(path)  # mark as recently used
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def evict():
+    with _lock:
+        entries = []
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Keep the most recently used files that fit the limits
+        entries.sort(reverse=True)
+        total = 0
+        for kept, (_, size, path) in enumerate(entries, start=1):
+            total += size
+            if total > MAX_BYTES or kept > MAX_FILES:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
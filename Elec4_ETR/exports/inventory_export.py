@@ -0,0 +1,30 @@
+import csv
+import io
+
+CSV_HEADER = ["Date", "Product", "Action", "Qty", "Previous Stock", "New Stock", "Remarks"]
+
+
+def stream_inventory_csv(rows, chunk_rows=200):
+    # Yields the inventory log as CSV in chunks as rows arrive
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+
+    count = 0
+    for row in rows:
+        writer.writerow([
+            row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+            row['name'],
+            row['change_type'],
+            row['quantity'],
+            row['previous_stock'],
+            row['new_stock'],
+            row['remarks'] or '',
+        ])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from product_import import IMPORT_COLUMNS
+
+# format -> (download name, mimetype)
+CATALOG_FORMATS = {
+    'csv': ("products.csv", "text/csv"),
+    'jsonl': ("products.jsonl", "application/x-ndjson"),
+}
+
+
+def iter_catalog(cur, batch_size=500):
+    # Pair with a server-side cursor to stream the catalog instead of buffering it
+    cur.execute("""
+        SELECT p.sku, p.name, p.description, p.price, p.stock, p.brand,
+               p.condition_type, c.name AS category, p.image
+        FROM products p
+        JOIN categories c ON p.category_id = c.id
+        ORDER BY p.id
+    """)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def stream_catalog_csv(rows, chunk_rows=200):
+    # Same columns product_import reads, so the file can be imported back
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(IMPORT_COLUMNS)
+
+    count = 0
+    for row in rows:
+        writer.writerow(['' if row[c] is None else row[c] for c in IMPORT_COLUMNS])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_catalog_jsonl(rows, chunk_rows=200):
+    lines = []
+    for row in rows:
+        record = {c: row[c] for c in IMPORT_COLUMNS}
+        if isinstance(record['price'], Decimal):
+            record['price'] = str(record['price'])
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) == chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+STREAMERS = {
+    'csv': stream_catalog_csv,
+    'jsonl': stream_catalog_jsonl,
+}
@@ -1,13 +1,38 @@
-from flask import send_file
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from docx import Document
+from openpyxl import Workbook
+from jobs import submit
+from exports import export_cache
+import csv
 import io
+import os
+import threading
+import time
+import uuid
 
+# format -> (download name, mimetype)
+EXPORT_FORMATS = {
+    'pdf': ("sales_report.pdf", "application/pdf"),
+    'docx': ("sales_report.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    'xlsx': ("sales_report.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ("sales_report.csv", "text/csv"),
+}
 
-def export_sales_pdf(data):
-    buffer = io.BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# Finished jobs nobody downloaded (pre-renders, abandoned tabs) are dropped
+# after this many seconds; the rendered file stays in the export cache
+JOB_TTL = 600
+
+
+def _line(row):
+    return f"{row['period']} | Orders: {row['total_orders']} | Sales: ₱{row['total_sales'] or 0:.2f}"
+
+
+def write_sales_pdf(rows, path):
+    pdf = canvas.Canvas(path, pagesize=letter)
     y = 750
 
     pdf.setFont("Helvetica-Bold", 14)
@@ -16,11 +41,8 @@ def export_sales_pdf(data):
 
     pdf.setFont("Helvetica", 10)
 
-    for row in data:
-        pdf.drawString(
-            50, y,
-            f"{row['period']} | Orders: {row['total_orders']} | Sales: ₱{row['total_sales'] or 0:.2f}"
-        )
+    for row in rows:
+        pdf.drawString(50, y, _line(row))
         y -= 20
 
         if y < 50:  # page break
@@ -29,31 +51,113 @@ def export_sales_pdf(data):
             pdf.setFont("Helvetica", 10)
 
     pdf.save()
-    buffer.seek(0)
-
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name="sales_report.pdf",
-        mimetype="application/pdf"
-    )
 
 
-def export_sales_docx(data):
-    buffer = io.BytesIO()
+def write_sales_docx(rows, path):
     doc = Document()
     doc.add_heading("Sales Report", level=1)
 
-    for row in data:
-        doc.add_paragraph(
-            f"{row['period']} | Orders: {row['total_orders']} | Sales: ₱{row['total_sales'] or 0:.2f}"
-        )
+    for row in rows:
+        doc.add_paragraph(_line(row))
+
+    doc.save(path)
+
+
+def write_sales_xlsx(rows, path):
+    # write_only keeps memory flat: each row is serialized as it is appended
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sales Report")
+    ws.append(["Period", "Total Orders", "Total Sales"])
+
+    for row in rows:
+        ws.append([row['period'], row['total_orders'], float(row['total_sales'] or 0)])
+
+    wb.save(path)
+
+
+WRITERS = {
+    'pdf': write_sales_pdf,
+    'docx': write_sales_docx,
+    'xlsx': write_sales_xlsx,
+}
+
+
+def stream_sales_csv(rows, chunk_rows=200):
+    # Yields the CSV in chunks as rows arrive, for a streamed Response
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Period", "Total Orders", "Total Sales"])
+
+    count = 0
+    for row in rows:
+        writer.writerow([row['period'], row['total_orders'], f"{row['total_sales'] or 0:.2f}"])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _render(fmt, rows_factory, path):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        WRITERS[fmt](rows_factory(), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    export_cache.evict()
+    return path
+
+
+def start_export(fmt, rows_factory, path):
+    # Renders a PDF/DOCX/XLSX report to path on the worker pool. rows_factory
+    # is called in the worker and should return an iterable of report rows.
+    # A render already running for the same path is shared, not repeated.
+    now = time.monotonic()
+    with _jobs_lock:
+        for job_id, job in list(_jobs.items()):
+            if job['future'].done() and now - job['started_at'] > JOB_TTL:
+                del _jobs[job_id]
+
+        for job_id, job in _jobs.items():
+            if job['path'] == path and not job['future'].done():
+                return job_id
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            'format': fmt,
+            'path': path,
+            'rows_factory': rows_factory,
+            'future': submit(_render, fmt, rows_factory, path),
+            'started_at': now,
+        }
+    return job_id
+
+
+def export_status(job_id):
+    # None for unknown jobs, otherwise 'pending', 'ready' or 'failed'
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None, None
+    if not job['future'].done():
+        return 'pending', job
+    if job['future'].result() is None:
+        return 'failed', job
+    if not os.path.exists(job['path']):
+        # Evicted from the export cache since it was rendered: render again
+        with _jobs_lock:
+            if job['future'].done():
+                job['future'] = submit(_render, job['format'], job['rows_factory'], job['path'])
+                job['started_at'] = time.monotonic()
+        return 'pending', job
+    return 'ready', job
 
-    doc.save(buffer)
-    buffer.seek(0)
 
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name="sales_report.docx"
-    )
+def forget_export(job_id):
+    # The rendered file stays behind in the export cache
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
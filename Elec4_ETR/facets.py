@@ -0,0 +1,39 @@
+from cache import TTLCache
+
+# Brand and category filter lists only change when an admin edits products or
+# categories, so they are cached and the write routes call invalidate_facets().
+facet_cache = TTLCache(ttl=300)
+
+
+def load_facets(cur):
+    # Both facet lists with their product counts in one grouped round trip
+    cur.execute("""
+        SELECT 'brand' AS facet, NULL AS id, brand AS name, COUNT(*) AS total
+        FROM products
+        WHERE brand IS NOT NULL
+        GROUP BY brand
+        UNION ALL
+        SELECT 'category' AS facet, c.id, c.name, c.product_count AS total
+        FROM categories c
+    """)
+    rows = cur.fetchall()
+
+    brands = [
+        {'brand': r['name'], 'total': r['total']}
+        for r in rows if r['facet'] == 'brand'
+    ]
+    categories = [
+        {'id': r['id'], 'name': r['name'], 'total': r['total']}
+        for r in rows if r['facet'] == 'category'
+    ]
+    brands.sort(key=lambda b: b['brand'])
+    categories.sort(key=lambda c: c['name'])
+    return {'brands': brands, 'categories': categories}
+
+
+def get_facets(cur):
+    return facet_cache.get_or_set('facets', lambda: load_facets(cur))
+
+
+def invalidate_facets():
+    facet_cache.clear()
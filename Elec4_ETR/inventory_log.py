@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+CHANGE_TYPES = ('ADD', 'REMOVE', 'ADJUST')
+
+# Every filter combination is served by one of the indexes in
+# migrations/008_inventory_logs_indexes.sql, newest first on (created_at, id).
+LOG_QUERY = """
+    SELECT l.id, l.product_id, l.change_type, l.quantity, l.previous_stock,
+           l.new_stock, l.remarks, l.created_at, p.name
+    FROM inventory_logs l
+    JOIN products p ON p.id = l.product_id
+    WHERE 1=1
+"""
+
+
+def parse_filters(args):
+    # Query-string filters -> cleaned values; anything malformed is dropped
+    filters = {}
+
+    product_id = args.get('product_id', '')
+    if product_id.isdigit():
+        filters['product_id'] = int(product_id)
+
+    change_type = args.get('change_type', '')
+    if change_type in CHANGE_TYPES:
+        filters['change_type'] = change_type
+
+    for key in ('date_from', 'date_to'):
+        try:
+            filters[key] = datetime.strptime(args.get(key, ''), '%Y-%m-%d')
+        except ValueError:
+            pass
+
+    return filters
+
+
+def log_query(filters):
+    query = LOG_QUERY
+    params = []
+
+    if 'product_id' in filters:
+        query += " AND l.product_id = %s"
+        params.append(filters['product_id'])
+
+    if 'change_type' in filters:
+        query += " AND l.change_type = %s"
+        params.append(filters['change_type'])
+
+    # Whole days, so date_to includes everything logged on that day
+    if 'date_from' in filters:
+        query += " AND l.created_at >= %s"
+        params.append(filters['date_from'])
+
+    if 'date_to' in filters:
+        query += " AND l.created_at < %s"
+        params.append(filters['date_to'] + timedelta(days=1))
+
+    return query, params
+
+
+def iter_log(cur, filters, batch_size=500):
+    # Pair with a server-side cursor to stream the log instead of buffering it
+    query, params = log_query(filters)
+    cur.execute(query + " ORDER BY l.created_at DESC, l.id DESC", params)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
@@ -0,0 +1,18 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Local worker pool for work that should not hold up a request
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='jobs')
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        log.exception("Background job %s failed", getattr(fn, '__name__', fn))
+
+
+def submit(fn, *args, **kwargs):
+    return executor.submit(_run, fn, args, kwargs)
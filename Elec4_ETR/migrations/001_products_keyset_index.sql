@@ -0,0 +1,5 @@
+-- Keyset pagination for /products seeks on (stock = 0, id), the catalog sort key.
+-- The catalog orders by stock = 0 ASC, id DESC, so id is descending here too:
+-- MySQL can only walk an index for a mixed-direction ORDER BY if it matches.
+-- Functional index parts need MySQL 8.0.13+.
+CREATE INDEX idx_products_soldout_id ON products ((stock = 0), id DESC);
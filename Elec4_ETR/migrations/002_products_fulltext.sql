@@ -0,0 +1,3 @@
+-- Inverted indexes behind product search (see search.py)
+ALTER TABLE products ADD FULLTEXT INDEX ft_products_search (name, brand, description);
+ALTER TABLE categories ADD FULLTEXT INDEX ft_categories_name (name);
@@ -0,0 +1,13 @@
+-- Daily sales rollup read by /admin/sales and /admin/sales/export (see sales_rollup.py)
+CREATE TABLE sales_daily (
+    day DATE NOT NULL PRIMARY KEY,
+    total_orders INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+INSERT INTO sales_daily (day, total_orders, total_sales)
+SELECT DATE(o.created_at), COUNT(DISTINCT o.id), SUM(oi.quantity * oi.price)
+FROM orders o
+JOIN order_items oi ON o.id = oi.order_id
+WHERE o.status IN ('Approved', 'Shipped', 'Delivered')
+GROUP BY DATE(o.created_at);
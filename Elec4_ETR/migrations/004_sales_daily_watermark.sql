@@ -0,0 +1,5 @@
+-- MAX(updated_at) is the data watermark that keys cached sales exports
+ALTER TABLE sales_daily
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+        DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_sales_daily_updated_at (updated_at);
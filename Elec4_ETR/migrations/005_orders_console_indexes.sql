@@ -0,0 +1,5 @@
+-- Admin orders console: newest-first keyset pages, optionally per status,
+-- and customer name prefix search
+CREATE INDEX idx_orders_created_at ON orders (created_at, id);
+CREATE INDEX idx_orders_status_created ON orders (status, created_at, id);
+CREATE INDEX idx_users_fullname ON users (fullname);
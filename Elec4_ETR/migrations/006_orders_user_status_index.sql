@@ -0,0 +1,2 @@
+-- Customer order history: per-user status tabs, newest first
+CREATE INDEX idx_orders_user_status_created ON orders (user_id, status, created_at, id);
@@ -0,0 +1,18 @@
+-- The cart upserts (INSERT ... ON DUPLICATE KEY UPDATE) need one row per user and product.
+-- Merge any duplicate rows before adding the key: the old add_to_cart could insert the
+-- same item twice, so each duplicated pair becomes one row with the summed quantity.
+CREATE TEMPORARY TABLE cart_items_merged AS
+SELECT user_id, product_id, SUM(quantity) AS quantity
+FROM cart_items
+GROUP BY user_id, product_id
+HAVING COUNT(*) > 1;
+
+DELETE c FROM cart_items c
+JOIN cart_items_merged m ON m.user_id = c.user_id AND m.product_id = c.product_id;
+
+INSERT INTO cart_items (user_id, product_id, quantity)
+SELECT user_id, product_id, quantity FROM cart_items_merged;
+
+DROP TEMPORARY TABLE cart_items_merged;
+
+ALTER TABLE cart_items ADD UNIQUE KEY uq_cart_items_user_product (user_id, product_id);
@@ -0,0 +1,7 @@
+-- Inventory log: newest first, optionally narrowed to a product or change type
+CREATE INDEX idx_inventory_logs_created ON inventory_logs (created_at, id);
+CREATE INDEX idx_inventory_logs_product_created ON inventory_logs (product_id, created_at, id);
+CREATE INDEX idx_inventory_logs_type_created ON inventory_logs (change_type, created_at, id);
+
+-- Product picker: name prefix lookups
+CREATE INDEX idx_products_name ON products (name);
@@ -0,0 +1,4 @@
+-- Bulk import upserts products by SKU (see product_import.py)
+ALTER TABLE products ADD COLUMN sku VARCHAR(64) NULL AFTER id;
+UPDATE products SET sku = CONCAT('P', id) WHERE sku IS NULL;
+CREATE UNIQUE INDEX uq_products_sku ON products (sku);
@@ -0,0 +1,34 @@
+-- Low-stock thresholds: per product, else per category, else 5 (see stock_alerts.py)
+ALTER TABLE products ADD COLUMN low_stock_threshold INT NULL;
+ALTER TABLE categories ADD COLUMN low_stock_threshold INT NULL;
+
+-- Products that are currently low or sold out, kept up to date by stock_alerts.track()
+CREATE TABLE stock_watch (
+    product_id INT NOT NULL PRIMARY KEY,
+    level ENUM('low', 'sold_out') NOT NULL,
+    stock INT NOT NULL,
+    threshold INT NOT NULL,
+    since TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_stock_watch_level (level, product_id),
+    CONSTRAINT fk_stock_watch_product FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+);
+
+-- Outbox drained by stock_alerts.AlertDispatcher
+CREATE TABLE stock_alerts (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    level ENUM('low', 'sold_out') NOT NULL,
+    stock INT NOT NULL,
+    threshold INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP NULL,
+    KEY idx_stock_alerts_pending (delivered_at, id),
+    CONSTRAINT fk_stock_alerts_product FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+);
+
+-- One-time fill; from here on only changed products are re-checked
+INSERT INTO stock_watch (product_id, level, stock, threshold)
+SELECT p.id, IF(p.stock <= 0, 'sold_out', 'low'), p.stock, COALESCE(p.low_stock_threshold, c.low_stock_threshold, 5)
+FROM products p
+JOIN categories c ON p.category_id = c.id
+WHERE p.stock <= COALESCE(p.low_stock_threshold, c.low_stock_threshold, 5);
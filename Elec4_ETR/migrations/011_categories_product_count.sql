@@ -0,0 +1,5 @@
+-- Per-category product counter kept by category_counts.py
+ALTER TABLE categories ADD COLUMN product_count INT NOT NULL DEFAULT 0;
+
+UPDATE categories c
+SET c.product_count = (SELECT COUNT(*) FROM products p WHERE p.category_id = c.id);
@@ -0,0 +1,88 @@
+from stock_alerts import track
+
+
+class InsufficientStock(Exception):
+    def __init__(self, items):
+        super().__init__("Not enough stock")
+        self.items = items
+
+
+def place_order(conn, user_id, payment_method, proof_filename, product_ids, quantities=None):
+    # Turns the selected cart rows into an order in one transaction with a
+    # fixed number of statements, however many items are checked out.
+    # quantities maps product_id -> requested quantity (defaults to the cart's).
+    # Raises InsufficientStock, leaving nothing written, if any item is short.
+    quantities = quantities or {}
+    cur = conn.cursor()
+    try:
+        placeholders = ','.join(['%s'] * len(product_ids))
+        cur.execute(f"""
+            SELECT c.product_id, c.quantity, p.price, p.name
+            FROM cart_items c
+            JOIN products p ON c.product_id = p.id
+            WHERE c.user_id=%s AND c.product_id IN ({placeholders})
+        """, (user_id, *product_ids))
+        cart_items = cur.fetchall()
+        if not cart_items:
+            return None
+
+        lines = [
+            (item, max(1, int(quantities.get(item['product_id'], item['quantity']))))
+            for item in cart_items
+        ]
+
+        # Reserve stock for every line at once; a row only changes if it has
+        # enough stock, so a short item shows up as a missing affected row.
+        reservation = ' UNION ALL '.join(['SELECT %s AS product_id, %s AS qty'] * len(lines))
+        reservation_params = [v for item, qty in lines for v in (item['product_id'], qty)]
+        cur.execute(f"""
+            UPDATE products p
+            JOIN ({reservation}) r ON r.product_id = p.id
+            SET p.stock = p.stock - r.qty
+            WHERE p.stock >= r.qty
+        """, reservation_params)
+
+        if cur.rowcount != len(lines):
+            conn.rollback()
+            cur.execute(f"""
+                SELECT id, name, stock FROM products
+                WHERE id IN ({placeholders})
+            """, [item['product_id'] for item, _ in lines])
+            stock = {p['id']: p for p in cur.fetchall()}
+            # A product deleted meanwhile counts as out of stock. The list may
+            # also come back empty if stock went up again after the rollback.
+            short = []
+            for item, qty in lines:
+                product = stock.get(item['product_id'], {'id': item['product_id'], 'name': item['name'], 'stock': 0})
+                if product['stock'] < qty:
+                    short.append(product)
+            raise InsufficientStock(short)
+
+        cur.execute("""
+            INSERT INTO orders(user_id, payment_method, payment_proof)
+            VALUES(%s,%s,%s)
+        """, (user_id, payment_method, proof_filename))
+        order_id = cur.lastrowid
+
+        # executemany collapses this into a single multi-row INSERT
+        cur.executemany("""
+            INSERT INTO order_items(order_id, product_id, quantity, price)
+            VALUES(%s,%s,%s,%s)
+        """, [(order_id, item['product_id'], qty, item['price']) for item, qty in lines])
+
+        cur.execute(f"""
+            DELETE FROM cart_items
+            WHERE user_id=%s AND product_id IN ({placeholders})
+        """, (user_id, *[item['product_id'] for item, _ in lines]))
+
+        track(cur, [item['product_id'] for item, _ in lines])
+
+        conn.commit()
+        return order_id
+    except InsufficientStock:
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PageCache:
+    # Rendered pages keyed by path + normalized query string. An entry is
+    # fresh for `fresh` seconds, then served stale for up to `stale` more while
+    # one background render replaces it. clear() starts a new generation so a
+    # render that was in flight during an invalidation is thrown away. Keys
+    # come from query strings, so at most max_entries pages are kept, least
+    # recently used first out.
+
+    def __init__(self, fresh=30, stale=300, max_entries=500):
+        self.fresh = fresh
+        self.stale = stale
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        # Returns (entry, state) with state 'fresh', 'stale' or None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            age = time.monotonic() - entry['created_at']
+            if age >= self.fresh + self.stale:
+                del self._entries[key]
+                return None, None
+            self._entries.move_to_end(key)
+        return entry, 'fresh' if age < self.fresh else 'stale'
+
+    def store(self, key, body, generation=None):
+        entry = {
+            'body': body,
+            'etag': hashlib.sha1(body.encode('utf-8')).hexdigest(),
+            'created_at': time.monotonic(),
+        }
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def claim_refresh(self, key):
+        # Only one background render per key at a time
+        with self._lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+            return self.generation
+
+    def release_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
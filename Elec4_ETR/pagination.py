@@ -0,0 +1,91 @@
+import base64
+from datetime import datetime
+
+
+# Opaque cursor for keyset pagination: a tuple of ints packed as "a:b:..."
+# and base64-encoded so it can travel in the URL.
+def encode_cursor(*values):
+    raw = ':'.join(str(int(v)) for v in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        values = tuple(int(v) for v in raw.split(':'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if len(values) != size:
+        return None
+    return values
+
+
+def timestamp_key(value):
+    # DATETIME -> sortable int (20260107153000) so it fits in a cursor
+    return int(value.strftime('%Y%m%d%H%M%S'))
+
+
+def from_timestamp_key(value):
+    return datetime.strptime(str(value), '%Y%m%d%H%M%S')
+
+
+def decode_time_cursor(cursor):
+    # decode_cursor for fetch_newest_first's (timestamp, id) cursors; one with
+    # a timestamp that isn't a real date is treated as no cursor
+    values = decode_cursor(cursor, 2)
+    if values is None:
+        return None
+    try:
+        from_timestamp_key(values[0])
+    except ValueError:
+        return None
+    return values
+
+
+def fetch_newest_first(cur, query, params, limit, after=None, before=None,
+                       time_col='created_at', id_col='id'):
+    # Keyset page of `query` (a SELECT ... WHERE with no ORDER BY or LIMIT),
+    # newest first on (time_col, id_col). after/before come from
+    # decode_time_cursor.
+    # Returns (rows, prev_cursor, next_cursor).
+    params = list(params)
+    time_key = time_col.split('.')[-1]
+    id_key = id_col.split('.')[-1]
+
+    if before:
+        t = from_timestamp_key(before[0])
+        query += f"""
+            AND ({time_col} > %s OR ({time_col} = %s AND {id_col} > %s))
+            ORDER BY {time_col} ASC, {id_col} ASC
+            LIMIT %s
+        """
+        cur.execute(query, params + [t, t, before[1], limit + 1])
+        rows = list(cur.fetchall())
+        has_prev = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_next = True
+    else:
+        if after:
+            t = from_timestamp_key(after[0])
+            query += f" AND ({time_col} < %s OR ({time_col} = %s AND {id_col} < %s))"
+            params += [t, t, after[1]]
+        query += f"""
+            ORDER BY {time_col} DESC, {id_col} DESC
+            LIMIT %s
+        """
+        cur.execute(query, params + [limit + 1])
+        rows = list(cur.fetchall())
+        has_prev = bool(after)
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+
+    prev_cursor = next_cursor = None
+    if rows:
+        if has_prev:
+            prev_cursor = encode_cursor(timestamp_key(rows[0][time_key]), rows[0][id_key])
+        if has_next:
+            next_cursor = encode_cursor(timestamp_key(rows[-1][time_key]), rows[-1][id_key])
+    return rows, prev_cursor, next_cursor
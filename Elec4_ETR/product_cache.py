@@ -0,0 +1,88 @@
+import threading
+import time
+
+# Everything about a product except stock, which changes on every checkout and
+# is always read fresh (see stock_levels).
+PRODUCT_COLUMNS = """
+    p.id, p.name, p.description, p.price, p.brand, p.condition_type,
+    p.category_id, p.image, p.low_stock_threshold, c.name AS category
+"""
+
+
+class ProductCache:
+    # Read-through cache of product rows keyed by id. Every invalidate() bumps
+    # the row's version and clear() the cache-wide generation, so a load that
+    # raced with a write is not stored.
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._rows = {}
+        self._versions = {}
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def version(self, product_id):
+        with self._lock:
+            return self._versions.get(product_id, 0)
+
+    def get(self, cur, product_id):
+        return self.get_many(cur, [product_id]).get(product_id)
+
+    def get_many(self, cur, product_ids):
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for product_id in set(product_ids):
+                entry = self._rows.get(product_id)
+                if entry and entry[1] > now:
+                    found[product_id] = entry[0]
+                else:
+                    missing.append(product_id)
+            versions = {product_id: self._versions.get(product_id, 0) for product_id in missing}
+            generation = self.generation
+
+        if missing:
+            format_strings = ','.join(['%s'] * len(missing))
+            cur.execute(f"""
+                SELECT {PRODUCT_COLUMNS}
+                FROM products p
+                JOIN categories c ON p.category_id = c.id
+                WHERE p.id IN ({format_strings})
+            """, missing)
+            rows = cur.fetchall()
+
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                current = generation == self.generation
+                for row in rows:
+                    found[row['id']] = row
+                    if current and self._versions.get(row['id'], 0) == versions[row['id']]:
+                        self._rows[row['id']] = (row, expires_at)
+
+        return found
+
+    def invalidate(self, *product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._versions[product_id] = self._versions.get(product_id, 0) + 1
+                self._rows.pop(product_id, None)
+
+    def clear(self):
+        # Covers loads of ids that weren't cached yet; the per-row versions
+        # can start over
+        with self._lock:
+            self.generation += 1
+            self._rows.clear()
+            self._versions.clear()
+
+
+def stock_levels(cur, product_ids):
+    if not product_ids:
+        return {}
+    format_strings = ','.join(['%s'] * len(product_ids))
+    cur.execute(f"""
+        SELECT id, stock FROM products
+        WHERE id IN ({format_strings})
+    """, list(product_ids))
+    return {r['id']: r['stock'] for r in cur.fetchall()}
@@ -0,0 +1,292 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import submit
+from stock_alerts import track
+import category_counts
+from uploads import import_file, is_media_key, media_path
+
+log = logging.getLogger(__name__)
+
+# Same columns the export writes, so an exported catalog can be re-imported
+IMPORT_COLUMNS = ('sku', 'name', 'description', 'price', 'stock', 'brand', 'condition_type', 'category', 'image')
+CONDITIONS = ('Brand New', 'Preloved')
+
+# Rows per multi-row upsert and commit
+CHUNK_SIZE = 500
+
+# Imports run for minutes, so they get their own worker instead of holding
+# one of the two shared job workers; a second import waits for the first
+imports_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='imports')
+
+# Errors kept for the progress page; the counts cover the rest
+MAX_ERRORS = 50
+
+_imports = {}
+_imports_lock = threading.Lock()
+
+
+def iter_rows(stream, fmt):
+    # Streams dicts from a text file: CSV with a header row, or one JSON
+    # object per line. Unreadable JSON lines come through as None.
+    if fmt == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else None
+    else:
+        yield from csv.DictReader(stream)
+
+
+class CategoryLookup:
+    # Category name -> id, read once per import. Names are matched without
+    # regard to case; an unknown name creates the category on first use.
+
+    def __init__(self, cur):
+        self.reload(cur)
+
+    def reload(self, cur):
+        cur.execute("SELECT id, name FROM categories")
+        self.ids = {row['name'].strip().lower(): row['id'] for row in cur.fetchall()}
+
+    def resolve(self, cur, name):
+        key = name.strip().lower()
+        if key not in self.ids:
+            cur.execute("INSERT INTO categories (name) VALUES (%s)", (name.strip(),))
+            self.ids[key] = cur.lastrowid
+        return self.ids[key]
+
+
+def clean_row(raw, categories, cur):
+    # -> tuple in upsert column order; ValueError explains a rejected row
+    if raw is None:
+        raise ValueError("not a JSON object")
+
+    def text(column):
+        value = raw.get(column)
+        return str(value).strip() if value is not None else ''
+
+    sku = text('sku')
+    name = text('name')
+    if not sku or not name:
+        raise ValueError("sku and name are required")
+
+    try:
+        price = round(float(text('price')), 2)
+        stock = int(text('stock') or 0)
+    except ValueError:
+        raise ValueError("price and stock must be numbers")
+    if price < 0 or stock < 0:
+        raise ValueError("price and stock cannot be negative")
+
+    condition = text('condition_type') or 'Brand New'
+    if condition not in CONDITIONS:
+        raise ValueError(f"condition_type must be one of {', '.join(CONDITIONS)}")
+
+    category = text('category')
+    if not category:
+        raise ValueError("category is required")
+
+    return (
+        sku, name, text('description'), price, stock, text('brand') or None,
+        condition, categories.resolve(cur, category)
+    )
+
+
+def image_source(image_dir, filename):
+    # Media keys (as exported) are reused as-is. Anything else must be a file
+    # inside image_dir.
+    if is_media_key(filename) and os.path.isfile(media_path(filename)):
+        return filename
+    if not image_dir:
+        return None
+    root = os.path.realpath(image_dir)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def fetch_images(standalone_cursor, images, on_commit=None):
+    # Copies (sku, source) images into the media store off the import's path
+    keys = []
+    for sku, source in images:
+        try:
+            key = source if is_media_key(source) else import_file(source)
+        except OSError:
+            log.warning("Could not read image %s for %s", source, sku)
+            continue
+        keys.append((key, sku))
+
+    if keys:
+        with standalone_cursor() as cur:
+            cur.executemany("UPDATE products SET image=%s WHERE sku=%s", keys)
+            cur.connection.commit()
+        if on_commit:
+            on_commit()
+
+
+def assign_sku(cur, product_id):
+    # Products added through the admin forms get the same P<id> SKU that
+    # migration 009 gave existing ones, so they survive export and re-import.
+    # An import may already have used that SKU for another product; then the
+    # first free P<id>-2, P<id>-3, ... is taken instead.
+    sku = f"P{product_id}"
+    suffix = 1
+    while True:
+        cur.execute("SELECT 1 FROM products WHERE sku=%s", (sku,))
+        if cur.fetchone() is None:
+            break
+        suffix += 1
+        sku = f"P{product_id}-{suffix}"
+    cur.execute("UPDATE products SET sku=%s WHERE id=%s AND sku IS NULL", (sku, product_id))
+    return sku
+
+
+def _write_chunk(cur, values):
+    # Returns how many of the rows were new
+    placeholders = ','.join(['%s'] * len(values))
+    cur.execute(
+        f"SELECT sku, category_id FROM products WHERE sku IN ({placeholders})",
+        [v[0] for v in values]
+    )
+    existing = {row['sku']: row['category_id'] for row in cur.fetchall()}
+
+    # executemany collapses this into a single multi-row INSERT
+    cur.executemany("""
+        INSERT INTO products
+        (sku, name, description, price, stock, brand, condition_type, category_id)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE
+            name=VALUES(name), description=VALUES(description), price=VALUES(price),
+            stock=VALUES(stock), brand=VALUES(brand),
+            condition_type=VALUES(condition_type), category_id=VALUES(category_id)
+    """, values)
+
+    cur.execute(
+        f"SELECT id FROM products WHERE sku IN ({placeholders})",
+        [v[0] for v in values]
+    )
+    track(cur, [row['id'] for row in cur.fetchall()])
+
+    # Products may have arrived in or left any of these categories
+    category_counts.recount(cur, set(existing.values()) | {v[7] for v in values})
+    return len({v[0] for v in values} - set(existing))
+
+
+def import_products(standalone_cursor, rows, image_dir=None, progress=None,
+                    on_commit=None, chunk_size=CHUNK_SIZE):
+    # Upserts products by SKU, chunk_size rows per statement and commit, so a
+    # catalog of any size streams through in constant memory. A chunk that
+    # fails is rolled back and counted as failed; the import carries on.
+    # progress (a dict) is updated in place as chunks land, and on_commit is
+    # called after every chunk so cached catalog pages can be dropped.
+    progress = progress if progress is not None else {}
+    progress.update(rows=0, created=0, updated=0, failed=0, images_queued=0, missing_images=0, errors=[])
+    started = time.monotonic()
+
+    def note(row_number, message):
+        if len(progress['errors']) < MAX_ERRORS:
+            progress['errors'].append(f"Row {row_number}: {message}")
+
+    def reject(row_number, message):
+        progress['failed'] += 1
+        note(row_number, message)
+
+    with standalone_cursor() as cur:
+        conn = cur.connection
+        categories = CategoryLookup(cur)
+        values = []
+        images = []
+        first_row = 1
+
+        def flush():
+            try:
+                created = _write_chunk(cur, values)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                # Categories created in this chunk were rolled back with it
+                categories.reload(cur)
+                progress['failed'] += len(values)
+                note(first_row, f"chunk of {len(values)} rows from here failed ({e})")
+                return
+            progress['created'] += created
+            progress['updated'] += len(values) - created
+            if on_commit:
+                on_commit()
+            if images:
+                submit(fetch_images, standalone_cursor, list(images), on_commit)
+                progress['images_queued'] += len(images)
+
+        for row_number, raw in enumerate(rows, start=1):
+            progress['rows'] = row_number
+            try:
+                values.append(clean_row(raw, categories, cur))
+            except ValueError as e:
+                reject(row_number, e)
+                continue
+
+            image = str(raw.get('image') or '').strip()
+            source = image_source(image_dir, image) if image else None
+            if source:
+                images.append((values[-1][0], source))
+            elif image:
+                progress['missing_images'] += 1
+                note(row_number, f"image {image} not found, product imported without it")
+
+            if len(values) >= chunk_size:
+                flush()
+                values, images = [], []
+                first_row = row_number + 1
+
+            elapsed = time.monotonic() - started
+            progress['elapsed'] = round(elapsed, 1)
+            progress['rows_per_sec'] = round(row_number / elapsed) if elapsed else 0
+
+        if values:
+            flush()
+
+    elapsed = time.monotonic() - started
+    progress['elapsed'] = round(elapsed, 1)
+    progress['rows_per_sec'] = round(progress['rows'] / elapsed) if elapsed else 0
+    return progress
+
+
+def _run_import(job_id, standalone_cursor, path, fmt, image_dir, on_commit):
+    progress = _imports[job_id]['progress']
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            import_products(standalone_cursor, iter_rows(f, fmt), image_dir, progress, on_commit)
+        progress['status'] = 'done'
+    except Exception:
+        progress['status'] = 'failed'
+        log.exception("Product import %s failed", job_id)
+    finally:
+        os.remove(path)
+
+
+def start_import(standalone_cursor, path, fmt, image_dir=None, on_commit=None):
+    # Imports the file at path on the import worker and deletes it afterwards
+    job_id = uuid.uuid4().hex
+    with _imports_lock:
+        _imports[job_id] = {'progress': {'status': 'running', 'format': fmt}}
+    imports_executor.submit(_run_import, job_id, standalone_cursor, path, fmt, image_dir, on_commit)
+    return job_id
+
+
+def import_status(job_id):
+    # Progress dict of a running or finished import, None if unknown
+    with _imports_lock:
+        job = _imports.get(job_id)
+    return dict(job['progress']) if job else None
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
+import sales_rollup
+
+REPORT_TYPES = ('daily', 'weekly', 'monthly')
+
+
+@lru_cache(maxsize=8192)
+def period_label(report_type, period):
+    # period is what sales_rollup.fetch_report returns: a DATE for daily,
+    # a YEARWEEK(day, 1) number for weekly and 'YYYY-MM' for monthly
+    if report_type == 'weekly':
+        # YEARWEEK mode 1 numbers weeks the ISO way (Monday first)
+        year, week = divmod(int(period), 100)
+        monday = date.fromisocalendar(year, week, 1)
+        sunday = monday + timedelta(days=6)
+        return f"{monday.strftime('%b %d')} – {sunday.strftime('%b %d, %Y')}"  # Jan 05 – Jan 11, 2026
+    if report_type == 'monthly':
+        year, month = str(period).split('-')
+        return date(int(year), int(month), 1).strftime("%B %Y")  # January 2026
+    if not isinstance(period, date):
+        period = date.fromisoformat(str(period))
+    return period.strftime("%b %d, %Y")  # Jan 07, 2026
+
+
+def label_periods(report_type, periods):
+    # Labels each distinct period once, whatever the number of rows
+    labels = {p: period_label(report_type, p) for p in set(periods)}
+    return [labels[p] for p in periods]
+
+
+def _report_row(label, r):
+    return {
+        'period': label,
+        'total_orders': r['total_orders'],
+        'total_sales': r['total_sales'] if r['total_sales'] is not None else 0
+    }
+
+
+def build_sales_report(rows, report_type):
+    labels = label_periods(report_type, [r['period'] for r in rows])
+    return [_report_row(label, r) for label, r in zip(labels, rows)]
+
+
+def fetch_sales_report(cur, report_type):
+    if report_type not in REPORT_TYPES:
+        report_type = 'daily'
+    return build_sales_report(sales_rollup.fetch_report(cur, report_type), report_type)
+
+
+def iter_sales_report(cur, report_type):
+    # Row-at-a-time version for exports; labels still come from the cache
+    if report_type not in REPORT_TYPES:
+        report_type = 'daily'
+    for r in sales_rollup.iter_report(cur, report_type):
+        yield _report_row(period_label(report_type, r['period']), r)
@@ -0,0 +1,90 @@
+# sales_daily keeps one row per order date with the totals the sales reports
+# need, so reports read O(days) rows instead of every order line. Orders count
+# while they are in SALES_STATUSES; status changes adjust the affected day.
+SALES_STATUSES = ('Approved', 'Shipped', 'Delivered')
+
+
+def _adjust(cur, order_id, sign):
+    cur.execute("""
+        INSERT INTO sales_daily (day, total_orders, total_sales)
+        SELECT DATE(o.created_at), %s, %s * SUM(oi.quantity * oi.price)
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id
+        WHERE o.id = %s
+        GROUP BY o.id
+        ON DUPLICATE KEY UPDATE
+            total_orders = total_orders + VALUES(total_orders),
+            total_sales = total_sales + VALUES(total_sales)
+    """, (sign, sign, order_id))
+
+
+def apply_status_change(cur, order_id, old_status, new_status):
+    # Call in the same transaction as the status UPDATE. Returns True when the
+    # rollup changed.
+    was_counted = old_status in SALES_STATUSES
+    is_counted = new_status in SALES_STATUSES
+    if is_counted and not was_counted:
+        _adjust(cur, order_id, 1)
+        return True
+    if was_counted and not is_counted:
+        _adjust(cur, order_id, -1)
+        return True
+    return False
+
+
+def watermark(cur):
+    # Changes whenever any sales_daily row does; identifies a report's data
+    cur.execute("SELECT MAX(updated_at) AS changed_at FROM sales_daily")
+    row = cur.fetchone()
+    if row is None or row['changed_at'] is None:
+        return 'empty'
+    return row['changed_at'].strftime('%Y%m%d%H%M%S%f')
+
+
+def rebuild(cur):
+    cur.execute("DELETE FROM sales_daily")
+    cur.execute("""
+        INSERT INTO sales_daily (day, total_orders, total_sales)
+        SELECT DATE(o.created_at),
+               COUNT(DISTINCT o.id),
+               SUM(oi.quantity * oi.price)
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id
+        WHERE o.status IN ('Approved', 'Shipped', 'Delivered')
+        GROUP BY DATE(o.created_at)
+    """)
+
+
+def _report_query(report_type):
+    # Weekly and monthly totals are derived from the daily rows
+    if report_type == 'weekly':
+        period = "YEARWEEK(day, 1)"
+    elif report_type == 'monthly':
+        period = "DATE_FORMAT(day, '%Y-%m')"
+    else:
+        period = "day"
+
+    return f"""
+        SELECT {period} AS period,
+               SUM(total_orders) AS total_orders,
+               SUM(total_sales) AS total_sales
+        FROM sales_daily
+        WHERE total_orders > 0
+        GROUP BY {period}
+        ORDER BY period DESC
+    """
+
+
+def fetch_report(cur, report_type):
+    cur.execute(_report_query(report_type))
+    return cur.fetchall()
+
+
+def iter_report(cur, report_type, batch_size=500):
+    # Pair with a server-side cursor to stream rows instead of buffering them
+    cur.execute(_report_query(report_type))
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
@@ -0,0 +1,54 @@
+import re
+
+# InnoDB ignores FULLTEXT tokens shorter than innodb_ft_min_token_size (3)
+MIN_TOKEN_LENGTH = 3
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [t.lower() for t in TOKEN_RE.findall(text or '')]
+
+
+def boolean_query(text):
+    # Every token is required and prefix-matched: "can ae" -> "+can* +ae*"
+    tokens = [t for t in tokenize(text) if len(t) >= MIN_TOKEN_LENGTH]
+    return ' '.join(f'+{t}*' for t in tokens)
+
+
+def search_clause(text, product='products', category='categories'):
+    # Returns (where_sql, where_params, score_sql, score_params).
+    # Tokens too short for the FULLTEXT index (model codes like "M6" or
+    # "AE-1") must each appear somewhere in the name or brand instead.
+    query = boolean_query(text)
+    short = [t for t in tokenize(text) if len(t) < MIN_TOKEN_LENGTH]
+
+    where_sql = ''
+    where_params = []
+    for token in short:
+        where_sql += f" AND ({product}.name LIKE %s OR {product}.brand LIKE %s)"
+        where_params.extend([like_contains(token)] * 2)
+
+    if not query:
+        return where_sql, where_params, "0", []
+
+    product_match = f"MATCH({product}.name, {product}.brand, {product}.description) AGAINST (%s IN BOOLEAN MODE)"
+    category_match = f"MATCH({category}.name) AGAINST (%s IN BOOLEAN MODE)"
+
+    return (
+        f" AND ({product_match} OR {category_match})" + where_sql,
+        [query, query] + where_params,
+        f"({product_match} * 2 + {category_match})",
+        [query, query]
+    )
+
+
+def like_prefix(text):
+    # "abc" -> "abc%" with LIKE wildcards in the input escaped
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%"
+
+
+def like_contains(text):
+    # "abc" -> "%abc%", escaped the same way
+    return f"%{like_prefix(text)}"
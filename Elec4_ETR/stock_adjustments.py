@@ -0,0 +1,144 @@
+import csv
+import io
+
+from inventory_log import CHANGE_TYPES
+from stock_alerts import track
+
+# Rows per statement; a supplier delivery of thousands of SKUs still runs as a
+# handful of statements inside one transaction.
+CHUNK_SIZE = 1000
+
+# Mirrors new_stock() below, so the logged values match what the UPDATE wrote
+STOCK_EXPRESSION = """
+    CASE r.change_type
+        WHEN 'ADD' THEN p.stock + r.qty
+        WHEN 'REMOVE' THEN GREATEST(p.stock - r.qty, 0)
+        ELSE r.qty
+    END
+"""
+
+
+def new_stock(stock, change_type, qty):
+    if change_type == 'ADD':
+        return stock + qty
+    if change_type == 'REMOVE':
+        return max(0, stock - qty)
+    return qty  # ADJUST
+
+
+def read_csv(stream):
+    # CSV with a header row: product_id,change_type,qty,remarks
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return list(csv.DictReader(text))
+
+
+def clean_rows(raw_rows):
+    # Validates raw rows (dicts from CSV or JSON). Returns the adjustments to
+    # apply and a result per row; rows that fail validation are already final.
+    lines = []
+    results = []
+    for number, raw in enumerate(raw_rows, start=1):
+        result = {'row': number, 'product_id': raw.get('product_id')}
+        results.append(result)
+        try:
+            product_id = int(raw.get('product_id'))
+            qty = int(raw.get('qty', raw.get('quantity')))
+        except (TypeError, ValueError):
+            result.update(status='error', message="product_id and qty must be whole numbers")
+            continue
+
+        change_type = str(raw.get('change_type', '')).strip().upper()
+        if change_type not in CHANGE_TYPES:
+            result.update(status='error', message=f"change_type must be one of {', '.join(CHANGE_TYPES)}")
+            continue
+        if qty < 0:
+            result.update(status='error', message="qty cannot be negative")
+            continue
+
+        result['product_id'] = product_id
+        lines.append({
+            'result': result,
+            'product_id': product_id,
+            'change_type': change_type,
+            'qty': qty,
+            'remarks': raw.get('remarks') or '',
+        })
+    return lines, results
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_adjustments(conn, lines):
+    # Applies every adjustment in one transaction and fills in each line's
+    # result. Stock is changed with server-side arithmetic; the touched rows
+    # are locked first so checkouts wait instead of interleaving, and so the
+    # previous/new values written to inventory_logs are exact.
+    # Returns the ids of the products whose stock changed.
+    cur = conn.cursor()
+    try:
+        product_ids = sorted({line['product_id'] for line in lines})
+        stock = {}
+        for chunk in _chunks(product_ids):
+            placeholders = ','.join(['%s'] * len(chunk))
+            cur.execute(f"""
+                SELECT id, stock FROM products
+                WHERE id IN ({placeholders})
+                FOR UPDATE
+            """, chunk)
+            stock.update({row['id']: row['stock'] for row in cur.fetchall()})
+
+        # A product listed several times is adjusted once per pass, in file
+        # order, so each pass is a single UPDATE with one row per product.
+        passes = []
+        seen = {}
+        logs = []
+        for line in lines:
+            result = line['result']
+            product_id = line['product_id']
+            if product_id not in stock:
+                result.update(status='error', message="Unknown product")
+                continue
+
+            previous = stock[product_id]
+            stock[product_id] = new_stock(previous, line['change_type'], line['qty'])
+            result.update(status='ok', previous_stock=previous, new_stock=stock[product_id])
+
+            index = seen.get(product_id, 0)
+            seen[product_id] = index + 1
+            if index == len(passes):
+                passes.append([])
+            passes[index].append(line)
+            logs.append((product_id, line['change_type'], line['qty'], previous, stock[product_id], line['remarks']))
+
+        for batch in passes:
+            for chunk in _chunks(batch):
+                adjustments = ' UNION ALL '.join(
+                    ['SELECT %s AS product_id, %s AS change_type, %s AS qty'] * len(chunk)
+                )
+                params = [v for line in chunk for v in (line['product_id'], line['change_type'], line['qty'])]
+                cur.execute(f"""
+                    UPDATE products p
+                    JOIN ({adjustments}) r ON r.product_id = p.id
+                    SET p.stock = {STOCK_EXPRESSION}
+                """, params)
+
+        # executemany collapses these into multi-row INSERTs
+        for chunk in _chunks(logs):
+            cur.executemany("""
+                INSERT INTO inventory_logs
+                (product_id, change_type, quantity, previous_stock, new_stock, remarks)
+                VALUES (%s,%s,%s,%s,%s,%s)
+            """, chunk)
+
+        track(cur, seen)
+
+        conn.commit()
+        return set(seen)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import urllib.request
+
+from jobs import submit
+
+log = logging.getLogger(__name__)
+
+# Used when neither the product nor its category sets low_stock_threshold
+DEFAULT_THRESHOLD = 5
+
+# stock_watch holds exactly the products that are low or sold out, so the
+# low-stock set is an indexed lookup instead of a scan of products. track()
+# keeps it current for the products a write touched; every time a product
+# enters a level a row goes into the stock_alerts outbox for the dispatcher.
+
+
+def stock_level(stock, threshold):
+    if stock <= 0:
+        return 'sold_out'
+    if stock <= threshold:
+        return 'low'
+    return None
+
+
+def track(cur, product_ids):
+    # Call in the same transaction as the stock change, with the ids it
+    # touched. Returns how many alerts were queued.
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0
+
+    placeholders = ','.join(['%s'] * len(product_ids))
+    cur.execute(f"""
+        SELECT p.id, p.stock,
+               COALESCE(p.low_stock_threshold, c.low_stock_threshold, %s) AS threshold,
+               w.level AS watched
+        FROM products p
+        JOIN categories c ON p.category_id = c.id
+        LEFT JOIN stock_watch w ON w.product_id = p.id
+        WHERE p.id IN ({placeholders})
+    """, [DEFAULT_THRESHOLD, *product_ids])
+
+    watch = []
+    cleared = []
+    alerts = []
+    for row in cur.fetchall():
+        level = stock_level(row['stock'], row['threshold'])
+        if level is None:
+            if row['watched']:
+                cleared.append(row['id'])
+            continue
+        watch.append((row['id'], level, row['stock'], row['threshold']))
+        if level != row['watched']:
+            alerts.append((row['id'], level, row['stock'], row['threshold']))
+
+    if watch:
+        cur.executemany("""
+            INSERT INTO stock_watch (product_id, level, stock, threshold)
+            VALUES (%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE
+                since = IF(level = VALUES(level), since, CURRENT_TIMESTAMP),
+                level = VALUES(level), stock = VALUES(stock), threshold = VALUES(threshold)
+        """, watch)
+
+    if cleared:
+        placeholders = ','.join(['%s'] * len(cleared))
+        cur.execute(f"DELETE FROM stock_watch WHERE product_id IN ({placeholders})", cleared)
+
+    if alerts:
+        cur.executemany("""
+            INSERT INTO stock_alerts (product_id, level, stock, threshold)
+            VALUES (%s,%s,%s,%s)
+        """, alerts)
+
+    return len(alerts)
+
+
+def track_category(cur, category_id):
+    # A category's threshold changed: re-check its products (by category index)
+    cur.execute("SELECT id FROM products WHERE category_id=%s", (category_id,))
+    return track(cur, [row['id'] for row in cur.fetchall()])
+
+
+class AlertDispatcher:
+    # Drains the stock_alerts outbox on the job pool: each undelivered alert is
+    # POSTed as JSON to webhook_url, or just logged when there is none. Alerts
+    # that fail to send stay queued for the next drain. A drain claims its
+    # batch with FOR UPDATE SKIP LOCKED until it commits, so two drains (in
+    # this process or another worker) never send the same alert.
+
+    def __init__(self, standalone_cursor, webhook_url=None, batch_size=100):
+        self.standalone_cursor = standalone_cursor
+        self.webhook_url = webhook_url
+        self.batch_size = batch_size
+        self._queued = threading.Lock()
+
+    def notify(self):
+        # Several stock changes in a row share one queued drain
+        if self._queued.acquire(blocking=False):
+            submit(self.drain)
+
+    def drain(self):
+        self._queued.release()
+        with self.standalone_cursor() as cur:
+            while True:
+                cur.execute("""
+                    SELECT a.id, a.product_id, p.name, a.level, a.stock, a.threshold, a.created_at
+                    FROM stock_alerts a
+                    JOIN products p ON p.id = a.product_id
+                    WHERE a.delivered_at IS NULL
+                    ORDER BY a.id
+                    LIMIT %s
+                    FOR UPDATE OF a SKIP LOCKED
+                """, (self.batch_size,))
+                alerts = cur.fetchall()
+                if not alerts:
+                    cur.connection.rollback()
+                    return
+
+                delivered = []
+                for alert in alerts:
+                    try:
+                        self.send(alert)
+                    except OSError:
+                        log.warning("Stock alert %s not delivered, will retry", alert['id'])
+                        break
+                    delivered.append(alert['id'])
+
+                if delivered:
+                    placeholders = ','.join(['%s'] * len(delivered))
+                    cur.execute(f"""
+                        UPDATE stock_alerts SET delivered_at = CURRENT_TIMESTAMP
+                        WHERE id IN ({placeholders})
+                    """, delivered)
+                # Releases the claim on the alerts that weren't sent too
+                cur.connection.commit()
+
+                if len(delivered) < len(alerts):
+                    return
+
+    def send(self, alert):
+        payload = {
+            'product_id': alert['product_id'],
+            'name': alert['name'],
+            'level': alert['level'],
+            'stock': alert['stock'],
+            'threshold': alert['threshold'],
+            'created_at': alert['created_at'].isoformat(),
+        }
+        if not self.webhook_url:
+            log.warning("Stock alert: %s is %s (stock %s, threshold %s)",
+                        alert['name'], alert['level'], alert['stock'], alert['threshold'])
+            return
+
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
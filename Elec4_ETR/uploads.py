@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+
+from jobs import submit
+
+# Content-addressed upload store. Every file is kept once under the SHA-256 of
+# its bytes, sharded two levels deep (media/ab/cd/abcd....png), so the name of
+# a file never changes meaning and its URL can be cached forever.
+MEDIA_ROOT = 'media'
+MEDIA_KEY_RE = re.compile(r'^([0-9a-f]{64})(_\d+)?\.([a-z0-9]+)$')
+
+VARIANT_WIDTH = 480
+VARIANT_FORMATS = ('webp', 'jpg')
+
+# Extension for uploads whose name has none and whose bytes aren't an image
+DEFAULT_EXT = 'bin'
+
+
+def is_media_key(name):
+    return bool(name) and MEDIA_KEY_RE.match(name) is not None
+
+
+def media_path(key):
+    # Path of a stored file or variant; key is "<sha256>[_<width>].<ext>"
+    return os.path.join(MEDIA_ROOT, key[:2], key[2:4], key)
+
+
+def variant_key(key, fmt):
+    return f"{key.rsplit('.', 1)[0]}_{VARIANT_WIDTH}.{fmt}"
+
+
+def _tmp_path(path):
+    # A temp file of our own next to path, so identical uploads landing at
+    # the same time can't write into each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _extension(data, filename):
+    # From the filename if it has a usable one, else from the image format
+    name = secure_filename(filename or '')
+    if '.' in name:
+        ext = name.rsplit('.', 1)[1].lower()
+        if re.fullmatch(r'[a-z0-9]+', ext):
+            return ext
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt = (img.format or '').lower()
+    except Exception:
+        return DEFAULT_EXT
+    return {'jpeg': 'jpg'}.get(fmt, fmt) or DEFAULT_EXT
+
+
+def store_bytes(data, filename):
+    digest = hashlib.sha256(data).hexdigest()
+    key = f"{digest}.{_extension(data, filename)}"
+    path = media_path(key)
+
+    # Identical content is already stored (and its variants already queued)
+    if not os.path.exists(path):
+        _write(path, data)
+        submit(make_variants, key)
+
+    return key
+
+
+def store_upload(file):
+    # Returns the media key to keep in the database
+    return store_bytes(file.read(), file.filename)
+
+
+def make_variants(key):
+    with Image.open(media_path(key)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((VARIANT_WIDTH, VARIANT_WIDTH * 4))
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        for fmt in VARIANT_FORMATS:
+            target = media_path(variant_key(key, fmt))
+            if os.path.exists(target):
+                continue
+            tmp_target = _tmp_path(target)
+            try:
+                if fmt == 'webp':
+                    img.save(tmp_target, 'WEBP', quality=80, method=4)
+                else:
+                    img.convert('RGB').save(tmp_target, 'JPEG', quality=82, optimize=True, progressive=True)
+                os.replace(tmp_target, target)
+            finally:
+                if os.path.exists(tmp_target):
+                    os.remove(tmp_target)
+
+
+def import_file(path):
+    # Copies an upload saved before the store existed and returns its media key
+    with open(path, 'rb') as f:
+        key = store_bytes(f.read(), os.path.basename(path))
+    return key
+
+
+def backfill_variants():
+    queued = 0
+    for dirpath, _, filenames in os.walk(MEDIA_ROOT):
+        for filename in filenames:
+            match = MEDIA_KEY_RE.match(filename)
+            if not match or match.group(2):
+                continue
+            if all(os.path.exists(media_path(variant_key(filename, fmt))) for fmt in VARIANT_FORMATS):
+                continue
+            submit(make_variants, filename)
+            queued += 1
+    return queued
+